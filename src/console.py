@@ -77,6 +77,32 @@ def parse_args(ver):
     parser.add_argument('-sizemin' ,nargs=1,help='minimum file size')
     parser.add_argument('-sizemax' ,nargs=1,help='maximum file size')
 
+    parser.add_argument('--scan-threads' ,nargs=1,help='number of threads walking the directory trees (default: number of CPU cores, up to 8)',type=int)
+    parser.add_argument('--scan-threads-dev' ,nargs='*',help='limit of threads walking the device containing PATH at the same time, given as PATH=N pairs')
+
+    parser.add_argument('--io-strategy' ,nargs=1,help='hashing strategy: "ssd" - many concurrent readers, "hdd" - single reader in inode order, "auto" - detected for every device (default)',choices=('auto','ssd','hdd'))
+    parser.add_argument('--io-strategy-dev' ,nargs='*',help='hashing strategy for the device containing PATH, given as PATH=STRATEGY pairs')
+    parser.add_argument('--io-readers' ,nargs=1,help='fixed number of concurrent readers for the "ssd" strategy. By default the number of readers of every device is tuned during hashing, based on measured throughput',type=int)
+    parser.add_argument('--io-memory-limit' ,nargs=1,help='limit of memory used by read buffers of all readers (default: 256MB)')
+    parser.add_argument('--io-hints' ,nargs=1,help='kernel hints given for hashed files (linux): "readahead" - announce files queued ahead of the reader and sequential access (default), "nocache" - readahead and drop hashed files from the page cache, not to push out data of other processes, "off" - no hints',choices=('off','readahead','nocache'))
+    parser.add_argument('--cache-gc-unseen' ,action='store_true',help='remove from the cache entries of all files of scanned devices that were not found by the scan. By default only entries of modified files are removed')
+    parser.add_argument('--cache-max-age' ,nargs=1,help='remove from the cache entries not used for DAYS days',type=int)
+    parser.add_argument('--cache-max-entries' ,nargs=1,help='limit of cache entries of every device, least recently used entries are removed first',type=int)
+    parser.add_argument('--cache-stats' ,action='store_true',help='print cache statistics (entries, hit rates, reclaimed space) and exit')
+    parser.add_argument('--cache-compact' ,action='store_true',help='remove entries exceeding --cache-max-age / --cache-max-entries limits, compact the cache files and exit')
+    parser.add_argument('--checkpoint-interval' ,nargs=1,help='save digests calculated so far to the cache every N seconds of hashing (default: 60, 0 - off)',type=int)
+    parser.add_argument('--checkpoint-size' ,nargs=1,help='save digests calculated so far to the cache after every SIZE of hashed data (default: 4GB, 0 - off)')
+    parser.add_argument('--resume' ,action='store_true',help='scan again paths (and exclude expressions) of the last run that didn\'t finish hashing. Digests saved at checkpoints are not calculated again')
+    parser.add_argument('--compare-max' ,nargs=1,help='files of the same size are compared side by side instead of hashing, when there are up to N of them to check on solid-state devices (default: 3, 0 - always hashing). Identical files get digest of their data, cached like hashed ones',type=int)
+    parser.add_argument('--digest' ,nargs=1,help='content digest algorithm: "sha1", "blake2b", "blake2s", "xxh3" (non-cryptographic, requires xxhash module), "auto" - the fastest one measured on this machine (default). Cached digests of other algorithms are not used',choices=('auto','sha1','blake2b','blake2s','xxh3'))
+    parser.add_argument('--io-no-autotune' ,action='store_true',help='don\'t tune number of concurrent readers during hashing (8 readers for the "ssd" strategy)')
+    parser.add_argument('--incremental' ,action='store_true',help='save a snapshot of scanned directories and don\'t list again directories not modified since the previous scan of the same paths. Files modified in place, without any change of their directory, are not noticed until the directory changes')
+    parser.add_argument('--one-filesystem' ,action='store_true',help='don\'t walk into directories of filesystems other than the one of the scanned path (mount points)')
+    parser.add_argument('--skip-fs-types' ,nargs='*',help='don\'t walk into mount points of filesystems of given types (e.g. nfs nfs4 cifs). Pseudo filesystems (proc, sysfs, devtmpfs ...) are always skipped')
+    parser.add_argument('--hardlinks' ,action='store_true',help='don\'t ignore hardlinked files. Paths of the same inode are hashed once and shown as one member of a group (other paths in the tooltip and in the csv file)')
+    parser.add_argument('--stream' ,action='store_true',help='start hashing during the directory walk, as soon as a second file of the same size is found (solid-state devices only). Files are not compared side by side in this mode')
+    parser.add_argument('--watch' ,action='store_true',help='linux only: after the scan keep watching scanned paths and update groups of duplicates when files are created, modified, moved or deleted. Only changed files are hashed. In csv mode the csv file is written again after every update until Ctrl+C')
+
     parser_help=parser.format_help().split('\n')
     help_parts=[parser_help[0]] + parser_help[7::]
 
@@ -132,6 +158,92 @@ if __name__ == "__main__":
         command.append('-igps')
         command.append(args.igps)
 
+    if args.scan_threads:
+        command.append('--scan-threads')
+        command.append(str(args.scan_threads[0]))
+
+    if args.scan_threads_dev:
+        command.append('--scan-threads-dev')
+        command.extend(args.scan_threads_dev)
+
+    if args.io_strategy:
+        command.append('--io-strategy')
+        command.append(args.io_strategy[0])
+
+    if args.io_strategy_dev:
+        command.append('--io-strategy-dev')
+        command.extend(args.io_strategy_dev)
+
+    if args.io_readers:
+        command.append('--io-readers')
+        command.append(str(args.io_readers[0]))
+
+    if args.io_memory_limit:
+        command.append('--io-memory-limit')
+        command.append(args.io_memory_limit[0])
+
+    if args.io_hints:
+        command.append('--io-hints')
+        command.append(args.io_hints[0])
+
+    if args.cache_gc_unseen:
+        command.append('--cache-gc-unseen')
+
+    if args.cache_max_age:
+        command.append('--cache-max-age')
+        command.append(str(args.cache_max_age[0]))
+
+    if args.cache_max_entries:
+        command.append('--cache-max-entries')
+        command.append(str(args.cache_max_entries[0]))
+
+    if args.cache_stats:
+        command.append('--cache-stats')
+
+    if args.cache_compact:
+        command.append('--cache-compact')
+
+    if args.checkpoint_interval:
+        command.append('--checkpoint-interval')
+        command.append(str(args.checkpoint_interval[0]))
+
+    if args.checkpoint_size:
+        command.append('--checkpoint-size')
+        command.append(args.checkpoint_size[0])
+
+    if args.resume:
+        command.append('--resume')
+
+    if args.compare_max:
+        command.append('--compare-max')
+        command.append(str(args.compare_max[0]))
+
+    if args.digest:
+        command.append('--digest')
+        command.append(args.digest[0])
+
+    if args.io_no_autotune:
+        command.append('--io-no-autotune')
+
+    if args.incremental:
+        command.append('--incremental')
+
+    if args.watch:
+        command.append('--watch')
+
+    if args.stream:
+        command.append('--stream')
+
+    if args.one_filesystem:
+        command.append('--one-filesystem')
+
+    if args.skip_fs_types:
+        command.append('--skip-fs-types')
+        command.extend(args.skip_fs_types)
+
+    if args.hardlinks:
+        command.append('--hardlinks')
+
     if args.paths:
         command.extend(args.paths)
 
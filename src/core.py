@@ -26,8 +26,13 @@
 #
 ####################################################################################
 
-from collections import defaultdict
-from threading import Thread
+from collections import defaultdict,deque
+from itertools import accumulate
+from array import array
+from threading import Thread,Lock,Semaphore,Condition,Event
+from queue import Queue
+from select import select
+from struct import unpack_from
 
 from pathlib import Path
 from fnmatch import fnmatch
@@ -35,17 +40,21 @@ from re import search
 
 from time import sleep,strftime,localtime,time,perf_counter
 
-from os import stat,scandir,sep,symlink,link,cpu_count,name as os_name,rename as os_rename,remove as os_remove
-from stat import FILE_ATTRIBUTE_HIDDEN as stat_FILE_ATTRIBUTE_HIDDEN
+from os import stat,scandir,sep,symlink,link,cpu_count,fsencode,fsdecode,name as os_name,rename as os_rename,remove as os_remove,read as os_read
+from stat import S_ISREG,FILE_ATTRIBUTE_HIDDEN as stat_FILE_ATTRIBUTE_HIDDEN
 
-from os.path import dirname,relpath,normpath,basename,join as path_join,abspath as abspath,exists as path_exists,isdir as path_isdir
+from os.path import dirname,realpath,relpath,normpath,normcase,basename,splitext,join as path_join,abspath as abspath,exists as path_exists,isdir as path_isdir
 
 if os_name=='nt':
     from subprocess import CREATE_NO_WINDOW
+    posix_fadvise=None
+else:
+    from os import open as os_open,close as os_close,O_RDONLY,posix_fadvise,POSIX_FADV_WILLNEED,POSIX_FADV_SEQUENTIAL,POSIX_FADV_DONTNEED
 
 from sys import exit as sys_exit
 from pickle import dumps,loads
 from zstandard import ZstdCompressor,ZstdDecompressor
+from sqlite3 import connect as sqlite_connect
 
 from pi_heif import register_heif_opener
 register_heif_opener()
@@ -105,86 +114,776 @@ def str_to_bytes(string):
     except:
         return -1
 
+def path_values_to_dict(path_values,value_conv=int):
+    res={}
+    try:
+        for path_value in path_values:
+            path,separator,value = path_value.rpartition('=')
+            if not separator or not path:
+                return None
+            res[path]=value_conv(value)
+    except:
+        return None
+
+    return res
+
 def fnumber(num):
     return str(format(num,',d').replace(',',' '))
 
+#head & tail block size used by the probe stage
+PROBE_BLOCK_SIZE=64*1024
+#smaller files are hashed in full at once, probing them would read the same data
+PROBE_MIN_SIZE=4*PROBE_BLOCK_SIZE
+
+IO_STRATEGY_AUTO='auto'
+IO_STRATEGY_SSD='ssd'
+IO_STRATEGY_HDD='hdd'
+IO_STRATEGIES=(IO_STRATEGY_AUTO,IO_STRATEGY_SSD,IO_STRATEGY_HDD)
+
+SSD_READERS_DEFAULT=8
+
+#readers auto-tuning: throughput measured in windows, readers doubled while it pays off
+AUTOTUNE_INTERVAL=2.0
+AUTOTUNE_MIN_GAIN=0.1
+AUTOTUNE_MAX_READERS=32
+AUTOTUNE_START_READERS=2
+
+def get_dev_rotational(dev):
+    #True/False for block devices known to linux sysfs, None otherwise (windows, network, fuse ...)
+    if os_name=='nt':
+        return None
+
+    from os import major,minor
+
+    dev_sys_path=realpath(f'/sys/dev/block/{major(dev)}:{minor(dev)}')
+
+    #partition has no queue of its own - check the parent device
+    for sys_path in (dev_sys_path,dirname(dev_sys_path)):
+        try:
+            with open(path_join(sys_path,'queue','rotational'),'r') as rotational_file:
+                return bool(rotational_file.read().strip()=='1')
+        except Exception:
+            pass
+
+    return None
+
+#network filesystems identified by their source (server and share), other sources without uuid are not stable
+NETWORK_FS_TYPES=('nfs','nfs4','cifs','smb3','smbfs','9p')
+
+#kernel interfaces and virtual filesystems, never holding useful duplicates - not walked
+PSEUDO_FS_TYPES=('proc','sysfs','devtmpfs','devpts','cgroup','cgroup2','securityfs','debugfs','tracefs','pstore','bpf','configfs','fusectl','mqueue','hugetlbfs','autofs','binfmt_misc','efivarfs','selinuxfs','rpc_pipefs','nsfs')
+
+def get_mounts():
+    #mount point:filesystem type
+    from psutil import disk_partitions
+    return {normpath(partition.mountpoint):partition.fstype for partition in disk_partitions(all=True)}
+
+def get_dev_fs_id(dev):
+    #stable identity of filesystem (linux), st_dev of removable, lvm, network or fuse devices changes between mounts
+    #None if unknown (windows st_dev is already the volume serial number)
+    if os_name=='nt':
+        return None
+
+    from os import major,minor
+    from hashlib import sha1
+
+    try:
+        dev_major_minor=f'{major(dev)}:{minor(dev)}'
+        mounts=[]
+        with open('/proc/self/mountinfo','r') as mountinfo_file:
+            for line in mountinfo_file:
+                fields=line.split()
+                if fields[2]==dev_major_minor:
+                    separator=fields.index('-',6)
+                    mounts.append((fields[3]!='/',fields[3],fields[separator+1],fields[separator+2]))
+
+        if not mounts:
+            return None
+
+        #whole filesystem mount preferred over bind mounts of its subtrees
+        _,root,fs_type,source=min(mounts)
+
+        if source.startswith('/dev/'):
+            source_real=realpath(source)
+            for entry in scandir('/dev/disk/by-uuid'):
+                if realpath(entry.path)==source_real:
+                    fs_id=f'uuid-{entry.name}'
+                    break
+            else:
+                return None
+        elif fs_type in NETWORK_FS_TYPES or (fs_type.startswith('fuse.') and ':' in source):
+            fs_id=f'fs-{sha1(f"{fs_type}:{source}".encode()).hexdigest()[:16]}'
+        else:
+            return None
+
+        #btrfs subvolumes mounted separately have separate inode spaces
+        if root!='/':
+            fs_id+=f'-{sha1(root.encode()).hexdigest()[:8]}'
+
+        return fs_id
+    except Exception:
+        return None
+
+IO_HINTS_OFF='off'
+IO_HINTS_READAHEAD='readahead'
+IO_HINTS_NOCACHE='nocache'
+IO_HINTS=(IO_HINTS_OFF,IO_HINTS_READAHEAD,IO_HINTS_NOCACHE)
+
+#number of queued files announced to the kernel ahead of the reader, and announced bytes of every file
+IO_HINTS_LOOKAHEAD=4
+IO_HINTS_WILLNEED_MAX=8*1024*1024
+
+READ_BUFFER_SIZE=1024*1024
+READ_MEMORY_LIMIT_DEFAULT=256*1024*1024
+
+#digests calculated so far are flushed to the cache journal that often (seconds, bytes)
+CHECKPOINT_INTERVAL_DEFAULT=60
+CHECKPOINT_SIZE_DEFAULT=4*1024*1024*1024
+
+#files of that size and bigger are hashed in segments by many readers at once
+#digest of such file is the digest of digests of all its segments
+TREE_SEGMENT_SIZE=64*1024*1024
+TREE_MIN_SIZE=16*TREE_SEGMENT_SIZE
+
+def tree_digest_algo(digest_algo):
+    return f'{digest_algo}-tree{TREE_SEGMENT_SIZE>>20}M'
+
+#size groups with up to that many files to calculate are compared instead of hashed
+COMPARE_MAX_DEFAULT=3
+COMPARE_READERS=2
+
+DIGEST_AUTO='auto'
+DIGEST_SHA1='sha1'
+DIGEST_BLAKE2B='blake2b'
+DIGEST_BLAKE2S='blake2s'
+DIGEST_XXH3='xxh3'
+DIGESTS=(DIGEST_AUTO,DIGEST_SHA1,DIGEST_BLAKE2B,DIGEST_BLAKE2S,DIGEST_XXH3)
+
+#algorithm of cache entries written before algorithms were selectable
+DIGEST_LEGACY=DIGEST_SHA1
+
+DIGEST_BENCHMARK_ROUNDS=16
+
+def get_digest_constructors():
+    from hashlib import sha1,blake2b,blake2s
+    from functools import partial
+
+    #blake2 digests cut to the sha1 length
+    constructors={DIGEST_SHA1:sha1,DIGEST_BLAKE2B:partial(blake2b,digest_size=20),DIGEST_BLAKE2S:partial(blake2s,digest_size=20)}
+
+    try:
+        #optional, non-cryptographic
+        from xxhash import xxh3_128
+    except ImportError:
+        pass
+    else:
+        constructors[DIGEST_XXH3]=xxh3_128
+
+    return constructors
+
+def digest_benchmark(constructors):
+    from os import urandom
+
+    data=memoryview(urandom(READ_BUFFER_SIZE))
+    throughput={}
+    for algo,constructor in constructors.items():
+        hasher=constructor(data)
+        hasher_update=hasher.update
+
+        start=perf_counter()
+        for _ in range(DIGEST_BENCHMARK_ROUNDS):
+            hasher_update(data)
+        hasher.hexdigest()
+
+        throughput[algo]=DIGEST_BENCHMARK_ROUNDS*READ_BUFFER_SIZE/max(perf_counter()-start,1e-9)
+
+    return throughput
+
+#point lookup in the database costs few times more than reading one row of the whole table
+CACHE_STORE_LOOKUP_COST=4
+CACHE_COMPACT_FREE_RATIO=0.25
+
+CACHE_TABLES=('crc','probe','segments')
+
+#database files up to that size are read ahead into the page cache by background preloading
+CACHE_PRELOAD_WARM_MAX=1024*1024*1024
+
+def cache_format_migration_binary(connection):
+    #hex digests stored as text converted to binary ones
+    tables={name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for table in ('crc','probe'):
+        if table in tables:
+            connection.executemany(f'UPDATE {table} SET value=? WHERE inode=? AND mtime=? AND algo=?',[(bytes.fromhex(value),inode,mtime,algo) for inode,mtime,algo,value in connection.execute(f"SELECT inode,mtime,algo,value FROM {table} WHERE typeof(value)='text'")])
+    if 'segments' in tables:
+        connection.executemany('UPDATE segments SET value=? WHERE inode=? AND mtime=? AND algo=?',[(dumps(digests_binary(loads(value))),inode,mtime,algo) for inode,mtime,algo,value in connection.execute('SELECT inode,mtime,algo,value FROM segments')])
+
+def digests_binary(segments_done):
+    return {segment_nr:bytes.fromhex(digest) if isinstance(digest,str) else digest for segment_nr,digest in segments_done.items()}
+
+#format version of cache databases (sqlite user_version, 0 - databases written before it was introduced)
+#functions upgrading database of version N to N+1, entries keep their meaning unless it changed
+CACHE_FORMAT_VERSION=2
+CACHE_FORMAT_MIGRATIONS={0:lambda connection : None,1:cache_format_migration_binary}
+
+#format version of every kind of images cache data, kinds of other version are dropped on read
+#images cache of older versions has no header
+IMAGES_CACHE_FORMAT={'dimensions':1,'gps':1,'hashes':1,'failed':1}
+IMAGES_CACHE_FORMAT_LEGACY={'dimensions':1,'gps':1,'hashes':1}
+
+#images cache is sharded by device and kind of data, hashes also by hash size
+def images_cache_shard(kind,key):
+    return f'hashes{key[3]}' if kind=='hashes' else kind
+
+def images_cache_shard_kind(shard):
+    return 'hashes' if shard.startswith('hashes') else shard
+
+def images_cache_load(file_name):
+    with open(file_name, "rb") as dat_file:
+        images_cache = loads(ZstdDecompressor().decompress(dat_file.read()))
+
+    if 'format' in images_cache:
+        images_cache_format,images_cache=images_cache['format'],images_cache['data']
+    else:
+        images_cache_format=IMAGES_CACHE_FORMAT_LEGACY
+
+    return images_cache,[kind for kind in images_cache if images_cache_format.get(kind)!=IMAGES_CACHE_FORMAT.get(kind)]
+
+#time of the last use of cache entry is updated not more often than that (seconds)
+CACHE_SEEN_REFRESH=24*60*60
+
+def db_int(value):
+    #sqlite integers are 64-bit signed, bigger values (e.g. ReFS file ids) are stored as text
+    return value if -0x8000000000000000<=value<=0x7FFFFFFFFFFFFFFF else str(value)
+
+class CacheStore:
+    #(inode,mtime,algo):value map of a device kept in sqlite table, looked up by key
+    #new values are kept in memory until flush()
+    def __init__(self,connection,table,pickled=False):
+        self.connection=connection
+        self.table=table
+        self.pickled=pickled
+        self.loaded=None
+        self.pending={}
+        self.removed=set()
+        self.added=0
+
+        #seen - time of the last use of the entry, for eviction
+        connection.execute(f'CREATE TABLE IF NOT EXISTS {table} (inode,mtime,algo,value,seen INTEGER,PRIMARY KEY(inode,mtime,algo)) WITHOUT ROWID')
+        if 'seen' not in [column[1] for column in connection.execute(f'PRAGMA table_info({table})')]:
+            connection.execute(f'ALTER TABLE {table} ADD COLUMN seen INTEGER DEFAULT 0')
+
+        self.select_query=f'SELECT value FROM {table} WHERE inode=? AND mtime=? AND algo=?'
+
+    def __len__(self):
+        return self.connection.execute(f'SELECT count(*) FROM {self.table}').fetchone()[0]
+
+    def load_if_cheaper(self,lookups):
+        if lookups*CACHE_STORE_LOOKUP_COST<len(self):
+            return False
+
+        self.loaded={(int(inode),int(mtime),algo):value for inode,mtime,algo,value in self.connection.execute(f'SELECT inode,mtime,algo,value FROM {self.table}')}
+        return True
+
+    def get(self,key,default=None):
+        if key in self.pending:
+            return self.pending[key]
+
+        if key in self.removed:
+            return default
+
+        if self.loaded is None:
+            inode,mtime,algo=key
+            row=self.connection.execute(self.select_query,(db_int(inode),db_int(mtime),algo)).fetchone()
+            value=row[0] if row else None
+        else:
+            value=self.loaded.get(key)
+
+        if value is None:
+            return default
+
+        return loads(value) if self.pickled else value
+
+    def __contains__(self,key):
+        return self.get(key) is not None
+
+    def __setitem__(self,key,value):
+        self.pending[key]=value
+        self.removed.discard(key)
+
+    def update(self,entries):
+        for key,value in entries.items():
+            self[key]=value
+
+    def pop(self,key,default=None):
+        value=self.get(key,default)
+        self.pending.pop(key,None)
+        self.removed.add(key)
+        return value
+
+    def flush(self):
+        now=int(time())
+        with self.connection:
+            if self.pending:
+                self.connection.executemany(f'INSERT OR REPLACE INTO {self.table} VALUES (?,?,?,?,?)',[(db_int(inode),db_int(mtime),algo,dumps(value) if self.pickled else value,now) for (inode,mtime,algo),value in self.pending.items()])
+            if self.removed:
+                self.connection.executemany(f'DELETE FROM {self.table} WHERE inode=? AND mtime=? AND algo=?',[(db_int(inode),db_int(mtime),algo) for inode,mtime,algo in self.removed])
+
+        if self.loaded is not None:
+            self.loaded.update({key:dumps(value) for key,value in self.pending.items()} if self.pickled else self.pending)
+            for key in self.removed:
+                self.loaded.pop(key,None)
+
+        self.added+=len(self.pending)
+        self.pending.clear()
+        self.removed.clear()
+
+def cache_gc(connection,table,looked_up=None,seen_inodes=None,gc_unseen=False,max_age=0,max_entries=0):
+    #looked_up - inode:mtime of files looked up by the run, their entries of other mtime are superseded
+    #seen_inodes - inode:mtime of all files found by the walk, only with gc_unseen (None - unknown)
+    now=int(time())
+    removed=0
+    with connection:
+        if looked_up:
+            #by primary key - without reading the whole table
+            changes=connection.total_changes
+            connection.executemany(f'DELETE FROM {table} WHERE inode=? AND mtime<>?',[(db_int(inode),db_int(mtime)) for inode,mtime in looked_up.items()])
+            removed+=connection.total_changes-changes
+
+            connection.executemany(f'UPDATE {table} SET seen=? WHERE inode=? AND mtime=? AND coalesce(seen,0)<?',[(now,db_int(inode),db_int(mtime),now-CACHE_SEEN_REFRESH) for inode,mtime in looked_up.items()])
+
+        if seen_inodes is not None and gc_unseen:
+            #full sweep only on demand
+            to_remove=[(inode,mtime,algo) for inode,mtime,algo in connection.execute(f'SELECT inode,mtime,algo FROM {table}') if seen_inodes.get(int(inode))!=int(mtime)]
+            connection.executemany(f'DELETE FROM {table} WHERE inode=? AND mtime=? AND algo=?',to_remove)
+            removed+=len(to_remove)
+
+        if max_age:
+            changes=connection.total_changes
+            connection.execute(f'DELETE FROM {table} WHERE coalesce(seen,0)<?',(now-max_age,))
+            removed+=connection.total_changes-changes
+
+    if max_entries:
+        if (over_limit:=connection.execute(f'SELECT count(*) FROM {table}').fetchone()[0]-max_entries)>0:
+            #least recently used first
+            with connection:
+                connection.execute(f'DELETE FROM {table} WHERE (inode,mtime,algo) IN (SELECT inode,mtime,algo FROM {table} ORDER BY seen LIMIT ?)',(over_limit,))
+            removed+=over_limit
+
+    return removed
+
+class BuffersPool:
+    #reusable read buffers shared by all readers, total memory of buffers in use is limited
+    def __init__(self,buffer_size,memory_limit):
+        self.buffer_size=buffer_size
+        self.max_buffers=max(1,memory_limit//buffer_size)
+        self.free_buffers=[]
+        self.allocated=0
+        self.in_use=0
+        self.peak_in_use=0
+        self.condition=Condition()
+
+    def get(self):
+        with self.condition:
+            while not self.free_buffers and self.allocated>=self.max_buffers:
+                self.condition.wait()
+
+            if self.free_buffers:
+                buffer=self.free_buffers.pop()
+            else:
+                buffer=bytearray(self.buffer_size)
+                self.allocated+=1
+
+            self.in_use+=1
+            if self.in_use>self.peak_in_use:
+                self.peak_in_use=self.in_use
+
+            return buffer
+
+    def get_many(self,count):
+        #all buffers at once - no deadlock between readers holding some of them
+        with self.condition:
+            while len(self.free_buffers)+self.max_buffers-self.allocated<count:
+                self.condition.wait()
+
+            buffers=[]
+            for _ in range(count):
+                if self.free_buffers:
+                    buffers.append(self.free_buffers.pop())
+                else:
+                    buffers.append(bytearray(self.buffer_size))
+                    self.allocated+=1
+
+            self.in_use+=count
+            if self.in_use>self.peak_in_use:
+                self.peak_in_use=self.in_use
+
+            return buffers
+
+    def put(self,buffer):
+        with self.condition:
+            self.free_buffers.append(buffer)
+            self.in_use-=1
+            self.condition.notify_all()
+
+    def peak_memory(self):
+        return self.peak_in_use*self.buffer_size
+
 class CRCThreadedCalc:
-    def __init__(self,log):
+    def __init__(self,log,buffers_pool,digest_constructor,probe=False,readers=1,order_by_inode=False,autotune=False,io_hints=IO_HINTS_OFF,tree_min_size=0):
         self.log=log
+        self.buffers_pool=buffers_pool
+        self.digest_constructor=digest_constructor
+
+        #posix_fadvise is not available on windows
+        self.io_hints=io_hints if posix_fadvise else IO_HINTS_OFF
+        self.advised=set()
+        self.probe=probe
+        self.digest_func = self.probe_file if probe else self.hash_file
+        self.readers=readers
+        self.readers_active=0
+        self.order_by_inode=order_by_inode
+
+        self.autotune=autotune
+        self.autotune_time=0
+        self.autotune_done=0
+        self.autotune_throughput=0
+        self.autotune_prev_readers=readers
 
         self.data_dict={}
 
+        #tree hashing - (size,fullpath):{segment_nr:digest}, may be given from previous run
+        self.tree_min_size=tree_min_size
+        self.segments_done={}
+        self.segments_left={}
+
+        #keys of data_dict with digest calculated, in order of completion - for checkpoints
+        self.done_keys=[]
+        self.checkpointed=0
+
         self.file_info=(0,None)
-        self.progress_info=0
+        self.readers_progress=[]
         self.abort_action=False
         self.started=False
         self.thread = Thread(target=self.calc,daemon=True)
         self.log.info('CRCThreadedCalc %s initialized',self)
         self.size_done = 0
         self.files_done = 0
+        self.done_lock = Lock()
         self.thread_is_alive = self.thread.is_alive
 
     def __del__(self):
         self.log.info("CRCThreadedCalc %s gets destroyed",self)
 
+    @property
+    def progress_info(self):
+        return sum(self.readers_progress)
+
     def abort(self):
         self.abort_action=True
 
-    def calc(self):
-        from hashlib import sha1
+    def tune(self,now):
+        done = self.files_done if self.probe else self.size_done + self.progress_info
 
-        size_threshold=8*1024*1024
-        block_size=1*1024*1024
+        if not self.autotune_time:
+            self.autotune_time=now
+            self.autotune_done=done
+            return
 
-        self.started=True
+        time_diff = now-self.autotune_time
+        if time_diff<AUTOTUNE_INTERVAL:
+            return
 
-        self_data_dict = self.data_dict
+        throughput = (done-self.autotune_done)/time_diff
+        self.autotune_time=now
+        self.autotune_done=done
 
-        self.size_done = 0
-        self.files_done = 0
+        prev_throughput = self.autotune_throughput
+        self.autotune_throughput = throughput
 
-        files_done_local = 0
+        if not prev_throughput:
+            #first measure window
+            if self.readers<AUTOTUNE_MAX_READERS:
+                self.autotune_prev_readers=self.readers
+                self.readers=min(self.readers*2,AUTOTUNE_MAX_READERS)
+                self.log.info('CRCThreadedCalc %s autotune: %s/s with %s readers, trying %s',self,fnumber(int(throughput)),self.autotune_prev_readers,self.readers)
+            else:
+                self.autotune=False
+        elif throughput > prev_throughput*(1.0+AUTOTUNE_MIN_GAIN) and self.readers<AUTOTUNE_MAX_READERS:
+            self.autotune_prev_readers=self.readers
+            self.readers=min(self.readers*2,AUTOTUNE_MAX_READERS)
+            self.log.info('CRCThreadedCalc %s autotune: %s/s with %s readers, trying %s',self,fnumber(int(throughput)),self.autotune_prev_readers,self.readers)
+        else:
+            if throughput < prev_throughput*(1.0+AUTOTUNE_MIN_GAIN):
+                #no gain (or loss) - back to the previous number of readers
+                self.readers=self.autotune_prev_readers
+            self.autotune=False
+            self.log.info('CRCThreadedCalc %s autotune: %s/s, settled on %s readers',self,fnumber(int(throughput)),self.readers)
 
-        for (size,fullpath),(pathnr,path,file_name,mtime,ctime,inode) in list(sorted(self_data_dict.items(),key = lambda x : int(x[0][0]),reverse=True)):
-            try:
-                file_handle=open(fullpath,'rb')
-            except Exception as e:
-                self.log.error(e)
+    def item_paths(self,key):
+        return (key[1],)
 
-                if self.abort_action:
-                    sys_exit()
-            else:
-                if size<size_threshold:
-                    self_data_dict[(size,fullpath)]=(pathnr,path,file_name,mtime,ctime,inode,sha1(file_handle.read()).hexdigest())
-                    file_handle.close()
+    def advise_ahead(self,files_queue):
+        self_advised=self.advised
+        try:
+            for lookahead in range(IO_HINTS_LOOKAHEAD):
+                key,_ = files_queue[lookahead]
+                if key not in self_advised:
+                    self_advised.add(key)
+
+                    size=key[0]
+                    for fullpath in self.item_paths(key):
+                        file_descriptor=os_open(fullpath,O_RDONLY)
+                        try:
+                            posix_fadvise(file_descriptor,0,min(size,IO_HINTS_WILLNEED_MAX),POSIX_FADV_WILLNEED)
+                        finally:
+                            os_close(file_descriptor)
+        except IndexError:
+            pass
+        except Exception as e:
+            self.log.warning('advise_ahead:%s',e)
+
+    def probe_file(self,size,fullpath,reader_nr):
+        buffer = self.buffers_pool.get()
+        try:
+            buffer_view=memoryview(buffer)[:PROBE_BLOCK_SIZE]
+            with open(fullpath,'rb',buffering=0) as file_handle:
+                hasher = self.digest_constructor(buffer_view[:file_handle.readinto(buffer_view)])
+                file_handle.seek(size-PROBE_BLOCK_SIZE)
+                hasher.update(buffer_view[:file_handle.readinto(buffer_view)])
+
+                if self.io_hints==IO_HINTS_NOCACHE:
+                    posix_fadvise(file_handle.fileno(),0,0,POSIX_FADV_DONTNEED)
+        except Exception as e:
+            self.log.error(e)
+            return None
+        finally:
+            self.buffers_pool.put(buffer)
+
+        return hasher.digest()
+
+    def hash_file(self,size,fullpath,reader_nr):
+        hasher = self.digest_constructor()
+        hasher_update=hasher.update
+
+        self_readers_progress=self.readers_progress
+
+        buffer = self.buffers_pool.get()
+        try:
+            buffer_view=memoryview(buffer)
+            #unbuffered - data goes straight from the kernel to the pool buffer
+            with open(fullpath,'rb',buffering=0) as file_handle:
+                if self.io_hints!=IO_HINTS_OFF:
+                    posix_fadvise(file_handle.fileno(),0,0,POSIX_FADV_SEQUENTIAL)
+
+                file_handle_readinto=file_handle.readinto
+                while chunk_len := file_handle_readinto(buffer_view):
+                    hasher_update(buffer_view[:chunk_len])
+
+                    self_readers_progress[reader_nr]+=chunk_len
 
                     if self.abort_action:
-                        sys_exit()
-                else:
-                    hasher = sha1()
-                    hasher_update=hasher.update
+                        break
 
-                    file_handle_read_block_size=lambda : file_handle.read(block_size)
-                    while chunk := file_handle_read_block_size():
-                        hasher_update(chunk)
+                if self.io_hints==IO_HINTS_NOCACHE:
+                    #don't push out page cache of other processes
+                    posix_fadvise(file_handle.fileno(),0,0,POSIX_FADV_DONTNEED)
+        except Exception as e:
+            self.log.error(e)
+            return None
+        finally:
+            self_readers_progress[reader_nr]=0
+            self.buffers_pool.put(buffer)
 
-                        self.progress_info+=len(chunk)
+        if self.abort_action:
+            #only complete result
+            return None
 
-                        if self.abort_action:
-                            break
+        return hasher.digest()
+
+    def hash_segment(self,fullpath,offset,length,reader_nr):
+        hasher = self.digest_constructor()
+        hasher_update=hasher.update
+
+        self_readers_progress=self.readers_progress
 
-                    self.progress_info=0
-                    file_handle.close()
+        left=length
+        buffer = self.buffers_pool.get()
+        try:
+            buffer_view=memoryview(buffer)
+            with open(fullpath,'rb',buffering=0) as file_handle:
+                if self.io_hints!=IO_HINTS_OFF:
+                    posix_fadvise(file_handle.fileno(),offset,length,POSIX_FADV_SEQUENTIAL)
+
+                file_handle.seek(offset)
+                file_handle_readinto=file_handle.readinto
+                while left and (chunk_len := file_handle_readinto(buffer_view[:min(left,READ_BUFFER_SIZE)])):
+                    hasher_update(buffer_view[:chunk_len])
+                    left-=chunk_len
+
+                    self_readers_progress[reader_nr]+=chunk_len
 
                     if self.abort_action:
-                        sys_exit()  #thread
+                        break
 
-                    #only complete result
-                    self_data_dict[(size,fullpath)]=(pathnr,path,file_name,mtime,ctime,inode,hasher.hexdigest())
+                if self.io_hints==IO_HINTS_NOCACHE:
+                    posix_fadvise(file_handle.fileno(),offset,length,POSIX_FADV_DONTNEED)
+        except Exception as e:
+            self.log.error(e)
+            return None
+        finally:
+            self_readers_progress[reader_nr]=0
+            self.buffers_pool.put(buffer)
+
+        if self.abort_action:
+            return None
+
+        if left:
+            self.log.error('file shrunk during hashing:%s',fullpath)
+            return None
+
+        return hasher.digest()
+
+    def tree_digest(self,segments_done):
+        hasher = self.digest_constructor()
+        for segment_nr in range(len(segments_done)):
+            hasher.update(segments_done[segment_nr])
 
-            self.size_done += size
-            files_done_local += 1
-            self.files_done = files_done_local
+        return hasher.digest()
+
+    def calc_segment(self,reader_nr,size,fullpath,val,segment_nr):
+        offset=segment_nr*TREE_SEGMENT_SIZE
+        length=min(TREE_SEGMENT_SIZE,size-offset)
+
+        digest=self.hash_segment(fullpath,offset,length,reader_nr)
+
+        key=(size,fullpath)
+        segments_done=self.segments_done[key]
+        with self.done_lock:
+            if digest:
+                segments_done[segment_nr]=digest
+            self.segments_left[key]-=1
+            last=not self.segments_left[key]
+
+        if not last:
+            return length,0
+
+        if len(segments_done)==(size+TREE_SEGMENT_SIZE-1)//TREE_SEGMENT_SIZE:
+            self.data_dict[key]=val+(self.tree_digest(segments_done),)
+            self.done_keys.append(key)
+
+        return length,1
+
+    def calc_item(self,reader_nr,size,fullpath,val):
+        if self.tree_min_size and size>=self.tree_min_size:
+            return self.calc_segment(reader_nr,size,fullpath,*val)
+
+        if digest:=self.digest_func(size,fullpath,reader_nr):
+            self.data_dict[(size,fullpath)]=val+(digest,)
+            self.done_keys.append((size,fullpath))
+
+        return (0 if self.probe else size),1
+
+    def calc_reader(self,reader_nr,files_queue):
+        files_queue_popleft = files_queue.popleft
+        self_done_lock = self.done_lock
+        self_calc_item = self.calc_item
+
+        advise = bool(self.io_hints!=IO_HINTS_OFF and not self.probe)
+        self_advise_ahead = self.advise_ahead
+        self_advised_discard = self.advised.discard
+
+        while not self.abort_action:
+            with self_done_lock:
+                if self.readers_active>self.readers:
+                    #number of readers decreased
+                    self.readers_active-=1
+                    break
+
+            try:
+                (size,fullpath),val = files_queue_popleft()
+            except IndexError:
+                with self_done_lock:
+                    self.readers_active-=1
+                break
+
+            if advise:
+                self_advised_discard((size,fullpath))
+                self_advise_ahead(files_queue)
+
+            size_done,files_done = self_calc_item(reader_nr,size,fullpath,val)
+
+            if self.abort_action:
+                break
+
+            with self_done_lock:
+                self.size_done += size_done
+                self.files_done += files_done
+
+        sys_exit()  #thread
+
+    def calc(self):
+        self.started=True
+
+        self.size_done = 0
+        self.files_done = 0
+
+        if self.order_by_inode:
+            #rotational drive - minimize seeks
+            files_queue = deque(sorted(self.data_dict.items(),key = lambda x : x[1][5]))
+        else:
+            files_queue = deque(sorted(self.data_dict.items(),key = lambda x : int(x[0][0]),reverse=True))
+
+        if self.tree_min_size:
+            #big files replaced by their segments, consecutive segments are taken by many readers at once
+            #segments_done is being read by checkpoints
+            self.done_lock.acquire()
+            files_queue_tree = deque()
+            files_queue_tree_append = files_queue_tree.append
+            for key,val in files_queue:
+                size=key[0]
+                if size>=self.tree_min_size:
+                    segments_done=self.segments_done.setdefault(key,{})
+                    segments_to_calc=[segment_nr for segment_nr in range((size+TREE_SEGMENT_SIZE-1)//TREE_SEGMENT_SIZE) if segment_nr not in segments_done]
+
+                    #resumed segments
+                    self.size_done += sum([min(TREE_SEGMENT_SIZE,size-segment_nr*TREE_SEGMENT_SIZE) for segment_nr in segments_done])
+
+                    if segments_to_calc:
+                        self.segments_left[key]=len(segments_to_calc)
+                        for segment_nr in segments_to_calc:
+                            files_queue_tree_append( (key,(val,segment_nr)) )
+                    else:
+                        self.data_dict[key]=val+(self.tree_digest(segments_done),)
+                        self.done_keys.append(key)
+                        self.files_done += 1
+                else:
+                    files_queue_tree_append( (key,val) )
+
+            files_queue=files_queue_tree
+            self.done_lock.release()
+
+        readers=[]
+        self_readers_progress = self.readers_progress
+        self_done_lock = self.done_lock
+
+        #number of readers may be changed by tune() during calculation
+        while files_queue and not self.abort_action:
+            with self_done_lock:
+                readers_to_start = self.readers-self.readers_active
+                if readers_to_start>0:
+                    self.readers_active+=readers_to_start
+
+            for _ in range(readers_to_start):
+                reader_nr=len(self_readers_progress)
+                self_readers_progress.append(0)
+                reader=Thread(target=lambda reader_nr=reader_nr : self.calc_reader(reader_nr,files_queue),daemon=True)
+                readers.append(reader)
+                reader.start()
+
+            sleep(0.02)
+
+        for reader in readers:
+            reader.join()
 
         sys_exit()  #thread
 
@@ -196,6 +895,92 @@ class CRCThreadedCalc:
         self.log.info('CRCThreadedCalc %s join',self)
         self.thread.join()
 
+class CompareThreadedCalc(CRCThreadedCalc):
+    #few candidates of the same size read side by side, chunk by chunk - the comparison stops at the first difference
+    #data of files identical so far is hashed once, identical files get digest to cache. data_dict: (size,fullpaths):[(dev,val),...]
+    def __init__(self,log,buffers_pool,digest_constructor,readers=1,io_hints=IO_HINTS_OFF):
+        super().__init__(log,buffers_pool,digest_constructor,readers=readers,io_hints=io_hints)
+        self.groups=[]
+
+    def item_paths(self,key):
+        return key[1]
+
+    def calc_item(self,reader_nr,size,fullpaths,members):
+        if identical:=self.compare_files(size,fullpaths,reader_nr):
+            for indexes,digest in identical:
+                self.groups.append( (size,[(fullpaths[index],members[index]) for index in indexes],digest) )
+
+        return size*len(fullpaths),len(fullpaths)
+
+    def compare_files(self,size,fullpaths,reader_nr):
+        self_readers_progress=self.readers_progress
+
+        buffers = self.buffers_pool.get_many(len(fullpaths))
+        handle_of={}
+        view_of={}
+        try:
+            for index,fullpath in enumerate(fullpaths):
+                try:
+                    handle_of[index]=open(fullpath,'rb',buffering=0)
+                except Exception as e:
+                    self.log.error(e)
+                else:
+                    view_of[index]=memoryview(buffers[index])
+                    if self.io_hints!=IO_HINTS_OFF:
+                        posix_fadvise(handle_of[index].fileno(),0,0,POSIX_FADV_SEQUENTIAL)
+
+            #sets of files identical so far, with hasher of their common data
+            identical=[(list(handle_of),self.digest_constructor())] if len(handle_of)>1 else []
+            offset=0
+            while identical and offset<size:
+                if self.abort_action:
+                    #only complete result
+                    return None
+
+                chunk_len=min(READ_BUFFER_SIZE,size-offset)
+                identical_next=[]
+                for indexes,hasher in identical:
+                    chunks=[]
+                    for index in indexes:
+                        if handle_of[index].readinto(view_of[index][:chunk_len])!=chunk_len:
+                            self.log.warning('file changed during comparison:%s',fullpaths[index])
+                            continue
+
+                        self_readers_progress[reader_nr]+=chunk_len
+
+                        #bytearrays comparison is much faster than memoryviews one
+                        chunk = buffers[index] if chunk_len==READ_BUFFER_SIZE else buffers[index][:chunk_len]
+                        for chunk_indexes in chunks:
+                            if chunk_indexes[0]==chunk:
+                                chunk_indexes[1].append(index)
+                                break
+                        else:
+                            chunks.append( (chunk,[index]) )
+
+                    for chunk,chunk_indexes in chunks:
+                        if len(chunk_indexes)>1:
+                            #set may split - every part continues with its own hasher
+                            chunk_hasher=hasher.copy() if len(chunks)>1 else hasher
+                            chunk_hasher.update(chunk)
+                            identical_next.append( (chunk_indexes,chunk_hasher) )
+
+                identical=identical_next
+                offset+=chunk_len
+
+            return [(indexes,hasher.digest()) for indexes,hasher in identical]
+        except Exception as e:
+            self.log.error(e)
+            return None
+        finally:
+            for file_handle in handle_of.values():
+                if self.io_hints==IO_HINTS_NOCACHE:
+                    posix_fadvise(file_handle.fileno(),0,0,POSIX_FADV_DONTNEED)
+                file_handle.close()
+
+            self_readers_progress[reader_nr]=0
+            for buffer in buffers:
+                self.buffers_pool.put(buffer)
+
 windows = bool(os_name=='nt')
 
 def is_hidden_win(filepath):
@@ -210,6 +995,217 @@ MODE_CRC = 0
 MODE_SIMILARITY = 1
 MODE_GPS = 2
 
+#unsigned 64-bit columns, bigger file ids (ReFS) are kept aside
+INODE_MASK=0xFFFFFFFFFFFFFFFF
+
+class FilesTable:
+    #files found by one walker thread kept in columns, without tuple and int objects for every file
+    def __init__(self):
+        self.pathnr=array('B')
+        self.dir_id=array('Q')
+        self.name=[]
+        self.size=array('Q')
+        self.mtime=array('q')
+        self.ctime=array('q')
+        self.dev=array('Q')
+        self.inode=array('Q')
+        self.inode_big={}
+
+    def add(self,pathnr,dir_id,name,mtime,ctime,dev,inode,size):
+        if inode>INODE_MASK:
+            self.inode_big[len(self.name)]=inode
+
+        self.pathnr.append(pathnr)
+        self.dir_id.append(dir_id)
+        self.name.append(name)
+        self.size.append(size)
+        self.mtime.append(mtime)
+        self.ctime.append(ctime)
+        self.dev.append(dev)
+        self.inode.append(inode & INODE_MASK)
+
+#masks that are able to exclude whole subtree: matching "directory/" means matching everything below it
+EXCLUDE_PRUNE_BLOCKERS=('$','\\Z','\\b','\\B','(?=','(?!','(?<=','(?<!')
+
+class ExcludeMatcher:
+    #all masks compiled into one expression, alternatives named after mask number
+    def __init__(self,masks,reg_exp):
+        from re import compile as re_compile
+        from fnmatch import translate
+
+        self.masks=masks
+        self.prepare=normcase if (os_name=='nt' and not reg_exp) else None
+
+        expressions=[mask if reg_exp else translate(self.prepare(mask) if self.prepare else mask) for mask in masks]
+        prunable=[bool(not any(blocker in mask for blocker in EXCLUDE_PRUNE_BLOCKERS)) if reg_exp else mask.endswith('*') for mask in masks]
+
+        def compiled(numbers):
+            if not numbers:
+                return None
+
+            method_of = lambda expression : re_compile(expression).search if reg_exp else re_compile(expression).match
+
+            #expressions with groups are matched one by one - groups added by combining would break their numeric backreferences
+            combinable=[nr for nr in numbers if not re_compile(expressions[nr]).groups]
+            methods=[(nr,method_of(expressions[nr])) for nr in numbers if nr not in combinable]
+
+            combined_method=None
+            if combinable:
+                try:
+                    combined_method=method_of('|'.join([f'(?P<m{nr}>{expressions[nr]})' for nr in combinable]))
+                except Exception:
+                    #expressions that can't be combined (inline flags) - one by one
+                    methods.extend([(nr,method_of(expressions[nr])) for nr in combinable])
+
+            def match_any(path):
+                if combined_method and (match:=combined_method(path)):
+                    return int(match.lastgroup[1:])
+                return next((nr for nr,method in methods if method(path)),None)
+
+            return match_any
+
+        self.match_any=compiled(list(range(len(masks))))
+        self.prune_any=compiled([nr for nr in range(len(masks)) if prunable[nr]])
+
+    def match(self,path):
+        return self.match_any(self.prepare(path) if self.prepare else path)
+
+    def prune(self,path):
+        if self.prune_any:
+            return self.prune_any((self.prepare(path) if self.prepare else path) + sep)
+        return None
+
+#snapshot of scanned directories, directories of unchanged mtime & ctime are not listed by the next scan
+SCAN_SNAPSHOT_FORMAT=2
+
+def snapshot_record(mtime,ctime,subdirs,files):
+    #names and columns of file stats instead of tuples
+    try:
+        return (mtime,ctime,subdirs,[file[0] for file in files],array('q',[value for file in files for value in (file[1],file[2],file[3],file[6])]),array('Q',[value for file in files for value in (file[4],file[5])]))
+    except OverflowError:
+        #file ids wider than 64 bits - directory listed every time
+        return None
+
+def snapshot_record_entries(record):
+    mtime,ctime,subdirs,names,stats,ids=record
+    return subdirs,list(zip(names,stats[0::4],stats[1::4],stats[2::4],ids[0::2],ids[1::2],stats[3::4]))
+
+class DirsTable:
+    #every scanned directory gets an id, its name and the parent id
+    #subpath (relative to the scanned path) is built on first use and shared by all files of the directory
+    def __init__(self,paths_to_scan):
+        self.parent=array('q')
+        self.name=[]
+        self.pathnr=array('B')
+        self.subpaths={}
+        self.lock=Lock()
+
+        #first level subpath without separator when scanned path ends with it (drive root)
+        self.root_sep=['' if path.endswith(sep) else sep for path in paths_to_scan]
+
+    def add(self,parent,pathnr,name):
+        with self.lock:
+            self.parent.append(parent)
+            self.name.append(name)
+            self.pathnr.append(pathnr)
+            return len(self.name)-1
+
+    def subpath(self,dir_id):
+        self_subpaths=self.subpaths
+        if (subpath:=self_subpaths.get(dir_id)) is not None:
+            return subpath
+
+        #iteratively - the tree may be deeper than the recursion limit
+        chain=[]
+        while dir_id>=0 and dir_id not in self_subpaths:
+            chain.append(dir_id)
+            dir_id=self.parent[dir_id]
+
+        for dir_id in reversed(chain):
+            parent=self.parent[dir_id]
+            if parent<0:
+                self_subpaths[dir_id]=''
+            elif self_subpaths[parent]:
+                self_subpaths[dir_id]=self_subpaths[parent]+sep+self.name[dir_id]
+            else:
+                self_subpaths[dir_id]=self.root_sep[self.pathnr[dir_id]]+self.name[dir_id]
+
+        return self_subpaths[dir_id]
+
+#linux inotify through libc - no additional module needed
+IN_MODIFY=0x2
+IN_ATTRIB=0x4
+IN_CLOSE_WRITE=0x8
+IN_MOVED_FROM=0x40
+IN_MOVED_TO=0x80
+IN_CREATE=0x100
+IN_DELETE=0x200
+IN_DELETE_SELF=0x400
+IN_MOVE_SELF=0x800
+IN_Q_OVERFLOW=0x4000
+IN_IGNORED=0x8000
+IN_ONLYDIR=0x1000000
+IN_DONT_FOLLOW=0x2000000
+IN_ISDIR=0x40000000
+IN_CLOEXEC=0x80000
+
+WATCH_MASK=IN_MODIFY|IN_ATTRIB|IN_CLOSE_WRITE|IN_MOVED_FROM|IN_MOVED_TO|IN_CREATE|IN_DELETE|IN_DELETE_SELF|IN_MOVE_SELF|IN_ONLYDIR|IN_DONT_FOLLOW
+
+#hashing during the walk - readers are started for collected batch of files of that total size or number
+STREAM_BATCH_SIZE=256*1024*1024
+STREAM_BATCH_FILES=1024
+
+#changes are collected for that time before groups are updated
+WATCH_DELAY_DEFAULT=1.0
+WATCH_POLL=0.25
+
+class Inotify:
+    def __init__(self):
+        from ctypes import CDLL,get_errno
+        from ctypes.util import find_library
+
+        self.get_errno=get_errno
+        self.libc=CDLL(find_library('c'),use_errno=True)
+        self.fd=self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd<0:
+            raise OSError(get_errno(),'inotify_init1')
+
+        self.path_of_wd={}
+
+    def add(self,path):
+        if (wd:=self.libc.inotify_add_watch(self.fd,fsencode(path),WATCH_MASK))<0:
+            raise OSError(self.get_errno(),f'inotify_add_watch:{path}')
+        self.path_of_wd[wd]=path
+
+    def remove_tree(self,path):
+        #watches of moved directories would report old paths
+        path_sep=path+sep
+        for wd,wd_path in list(self.path_of_wd.items()):
+            if wd_path==path or wd_path.startswith(path_sep):
+                self.libc.inotify_rm_watch(self.fd,wd)
+                del self.path_of_wd[wd]
+
+    def read(self,timeout):
+        #(directory path,mask,name) of events available within timeout
+        if not select([self.fd],[],[],timeout)[0]:
+            return
+
+        data=os_read(self.fd,256*1024)
+        offset=0
+        while offset<len(data):
+            wd,mask,cookie,name_len=unpack_from('iIII',data,offset)
+            offset+=16
+            name=fsdecode(data[offset:offset+name_len].rstrip(b'\0'))
+            offset+=name_len
+
+            if mask & IN_IGNORED:
+                self.path_of_wd.pop(wd,None)
+            else:
+                yield self.path_of_wd.get(wd),mask,name
+
+    def close(self):
+        os_close(self.fd)
+
 class DudeCore:
     def handle_sigint(self):
         print("Received SIGINT signal")
@@ -217,6 +1213,8 @@ class DudeCore:
         self.abort()
 
     def reset(self):
+        self.watch_stop()
+
         self.scan_results_by_size=defaultdict(set)
         self.files_of_size_of_crc=defaultdict(lambda : defaultdict(set))
         self.files_of_size_of_crc_items=self.files_of_size_of_crc.items
@@ -226,6 +1224,8 @@ class DudeCore:
         self.exclude_list=[]
 
         self.files_of_images_groups=defaultdict(set)
+        self.hardlinks=defaultdict(list)
+        self.scan_seen={}
 
     def __init__(self,cache_dir,log_par):
         self.cache_dir=cache_dir
@@ -235,6 +1235,7 @@ class DudeCore:
         self.name_func = (lambda x : x.lower()) if self.windows else (lambda x : x)
 
         self.reset()
+        self.cache_preload_start()
 
     def get_full_path_to_scan(self,pathnr,path,file_name):
         return path_join(self.paths_to_scan[pathnr]+path,file_name)
@@ -342,8 +1343,522 @@ class DudeCore:
 
         return None
 
+    scan_threads=0
+    scan_threads_per_dev={}
+    def set_scan_threads(self,threads=0,threads_per_path=None):
+        self.scan_threads=threads
+
+        scan_threads_per_dev={}
+        for path,dev_threads in (threads_per_path or {}).items():
+            try:
+                scan_threads_per_dev[stat(path).st_dev]=dev_threads
+            except Exception as e:
+                return f"path:'{path}'\nERROR:{e}"
+
+        self.scan_threads_per_dev=scan_threads_per_dev
+        return False
+
+    scan_incremental=False
+    scan_snapshot_reused=0
+    scan_one_filesystem=False
+    scan_skip_fs_types=()
+    scan_hardlinks=False
     scan_update_info_path_nr=None
-    def scan(self,operation_mode,file_min_size_int=0,file_max_size_int=0,include_hidden=False):
+    def scan_walk(self,images_mode,file_min_size_int,file_max_size_int,include_hidden):
+        self_log_skipped = self.log_skipped
+        self_log_info=self.log.info
+        skipping_action = lambda *args : self_log_info(*args) if self_log_skipped else None
+
+        self_exclude_list=self.exclude_list
+        any_exclude_list = bool(self_exclude_list)
+        if any_exclude_list:
+            exclude_matcher=ExcludeMatcher(self_exclude_list,self.reg_exp)
+            exclude_match=exclude_matcher.match
+            exclude_prune=exclude_matcher.prune
+
+        self.exclude_hits=[0]*len(self_exclude_list)
+        self.exclude_pruned=0
+        self.exclude_time=0.0
+
+        dev_semaphores = {dev:Semaphore(dev_threads) for dev,dev_threads in self.scan_threads_per_dev.items()}
+        check_dev = bool(dev_semaphores)
+
+        #snapshot of the previous scan of the same paths with the same filters
+        snapshot_old=snapshot_new=None
+        self.scan_snapshot_reused=0
+        if self.scan_incremental:
+            snapshot_filters=(include_hidden,self.reg_exp,tuple(self_exclude_list),self.scan_one_filesystem,tuple(self.scan_skip_fs_types))
+            snapshot_old={}
+            for path_to_scan in self.paths_to_scan:
+                snapshot_old.update(self.scan_snapshot_read(path_to_scan,snapshot_filters))
+            snapshot_new=[{} for path_to_scan in self.paths_to_scan]
+
+        use_min_size = bool(file_min_size_int!=0)
+        use_max_size = bool(file_max_size_int!=0)
+        use_size = use_min_size or use_max_size
+
+        is_hidden_loc=is_hidden
+        supported_extensions = IMAGES_EXTENSIONS
+
+        #hardlinked files are grouped by inode in CRC mode
+        keep_hardlinks = self.scan_hardlinks and not images_mode
+
+        dirs_queue=Queue()
+        dirs_queue_put=dirs_queue.put
+        dirs_queue_get=dirs_queue.get
+        dirs_queue_task_done=dirs_queue.task_done
+
+        info_lock=Lock()
+        paths_to_scan=self.paths_to_scan
+
+        #files of sizes found more than once are hashed during the walk
+        stream_put=None
+        if self.scan_stream and not images_mode:
+            self.scan_stream_queue=Queue()
+            stream_put=self.scan_stream_queue.put
+            self.scan_stream_thread=Thread(target=lambda : self.scan_stream_calc(self.scan_stream_queue),daemon=True)
+            self.scan_stream_thread.start()
+
+        self.dirs=DirsTable(paths_to_scan)
+        self_dirs_add=self.dirs.add
+        self_dirs_subpath=self.dirs.subpath
+
+        preload_devs=set()
+        self_cache_preload=self.cache_preload
+
+        #mount points not walked into - pseudo filesystems, filesystems of skipped types, all in one filesystem mode
+        one_filesystem=self.scan_one_filesystem
+        skip_fs_types=set(PSEUDO_FS_TYPES).union(self.scan_skip_fs_types)
+        try:
+            mounts=get_mounts()
+        except Exception as e:
+            self.log.warning(f'mount table error: {e}')
+            mounts={}
+        mounts_skipped={mountpoint:fs_type for mountpoint,fs_type in mounts.items() if one_filesystem or fs_type in skip_fs_types}
+        self.log.info('mount points skipped: %s',len(mounts_skipped))
+
+        #(st_dev,st_ino) of directories queued so far - bind mounts and the same filesystem mounted twice are walked once
+        visited=set()
+        visited_add=visited.add
+        visited_lock=Lock()
+
+        for path_nr,path_to_scan in enumerate(paths_to_scan):
+            try:
+                root_stat=stat(path_to_scan)
+            except Exception as e:
+                skipping_action('scan root %s: error:%s',path_to_scan,e)
+                dev=None
+            else:
+                dev=root_stat.st_dev
+                visited_add((dev,root_stat.st_ino))
+            dirs_queue_put( (path_nr,path_to_scan,dev,self_dirs_add(-1,path_nr,'')) )
+
+        threads_results={}
+
+        def list_dir(path,dev):
+            #subdirectories and files left after hidden & exclude filters
+            subdirs=[]
+            files=[]
+
+            folder_exclude_hits=defaultdict(int)
+            folder_exclude_pruned=0
+            folder_exclude_time=0.0
+
+            with scandir(path) as res:
+                for entry in res:
+                    if self.abort_action:
+                        break
+
+                    if entry.is_symlink() :
+                        skipping_action('skippping link: %s / %s',path,entry.name)
+                    else:
+                        fullpath=path_join(path,entry.name)
+                        if not include_hidden and is_hidden_loc(fullpath):
+                            skipping_action('skipping hidden Mask:%s',fullpath)
+                            continue
+
+                        if any_exclude_list:
+                            match_start=perf_counter()
+                            mask_nr=exclude_match(fullpath)
+                            if mask_nr is None and entry.is_dir():
+                                #whole subtree excluded - not listed at all
+                                if (mask_nr:=exclude_prune(fullpath)) is not None:
+                                    folder_exclude_pruned+=1
+                            folder_exclude_time+=perf_counter()-match_start
+
+                            if mask_nr is not None:
+                                folder_exclude_hits[mask_nr]+=1
+                                skipping_action('skipping by Exclude Mask:%s',fullpath)
+                                continue
+
+                        if entry.is_dir():
+                            #mount table checked before stat - unavailable network mounts could block
+                            if fullpath in mounts_skipped:
+                                skipping_action('skipping mount point:%s (%s)',fullpath,mounts_skipped[fullpath])
+                                continue
+
+                            try:
+                                subdir_stat=entry.stat(follow_symlinks=False)
+                            except Exception as e:
+                                skipping_action('scandir(stat):%s error:%s',entry.name,e )
+                                continue
+
+                            #st_dev & st_ino of scandir entries are zero on windows
+                            subdir_dev=subdir_stat.st_dev or dev
+                            if one_filesystem and subdir_dev!=dev:
+                                skipping_action('skipping other filesystem:%s',fullpath)
+                                continue
+
+                            subdirs.append( (entry.name,subdir_dev,subdir_stat.st_ino) )
+                        elif entry.is_file():
+                            try:
+                                stat_res = stat(entry)
+                            except Exception as e:
+                                skipping_action('scandir(stat):%s error:%s',entry.name,e )
+                            else:
+                                files.append( (entry.name,stat_res.st_size,stat_res.st_mtime_ns,stat_res.st_ctime_ns,stat_res.st_dev,stat_res.st_ino,stat_res.st_nlink) )
+                        else:
+                            skipping_action('skipping another:%s',path)
+
+            if folder_exclude_hits or folder_exclude_time:
+                with info_lock:
+                    for mask_nr,hits in folder_exclude_hits.items():
+                        self.exclude_hits[mask_nr]+=hits
+                    self.exclude_pruned+=folder_exclude_pruned
+                    self.exclude_time+=folder_exclude_time
+
+            return subdirs,files
+
+        def scan_dir(results,path_nr,path,dev,dir_id):
+            path_to_scan=paths_to_scan[path_nr]
+            if path==path_to_scan:
+                self.info_path_to_scan=path_to_scan
+                self.info_path_nr=path_nr
+
+                if self.scan_update_info_path_nr:
+                    self.scan_update_info_path_nr()
+
+            self.info_line=path
+
+            try:
+                if snapshot_new is None:
+                    subdirs,files=list_dir(path,dev)
+                else:
+                    #directory stat taken before listing, changes made during listing are noticed next time
+                    dir_stat=stat(path)
+                    if (record:=snapshot_old.get(path)) and record[0]==dir_stat.st_mtime_ns and record[1]==dir_stat.st_ctime_ns:
+                        subdirs,files=snapshot_record_entries(record)
+                        with info_lock:
+                            self.scan_snapshot_reused+=1
+                    else:
+                        subdirs,files=list_dir(path,dev)
+                        record=snapshot_record(dir_stat.st_mtime_ns,dir_stat.st_ctime_ns,subdirs,files)
+
+                    if record and not self.abort_action:
+                        snapshot_new[path_nr][path]=record
+
+                with visited_lock:
+                    subdirs_new=[]
+                    for name,subdir_dev,subdir_ino in subdirs:
+                        if subdir_ino and (subdir_dev,subdir_ino) in visited:
+                            skipping_action('skipping already visited directory (bind mount, loop):%s',path_join(path,name))
+                        else:
+                            visited_add((subdir_dev,subdir_ino))
+                            subdirs_new.append( (name,subdir_dev) )
+
+                for name,subdir_dev in subdirs_new:
+                    dirs_queue_put( (path_nr,path_join(path,name),subdir_dev,self_dirs_add(dir_id,path_nr,name)) )
+
+                folder_size=0
+                folder_size_images=0
+                folder_counter=0
+                folder_counter_images=0
+                if images_mode:
+                    subpath=self_dirs_subpath(dir_id)
+
+                stream_files=[]
+                for name,size,mtime,ctime,file_dev,inode,nlink in files:
+                    if file_dev not in preload_devs:
+                        preload_devs.add(file_dev)
+                        self_cache_preload(file_dev)
+
+                    if nlink>1 and not keep_hardlinks:
+                        skipping_action('scan skipp - hardlinks %s - %s,%s,%s',nlink,path_nr,path,name)
+                    else:
+                        if size:
+                            folder_size+=size
+
+                            if use_size:
+                                if use_min_size:
+                                    if size<file_min_size_int:
+                                        skipping_action(f'size<min {size},{file_min_size_int},{path},{name}' )
+                                        continue
+                                if use_max_size:
+                                    if size>file_max_size_int:
+                                        skipping_action(f'size>max {size},{file_max_size_int},{path},{name}' )
+                                        continue
+
+                            if images_mode:
+                                #https://pillow.readthedocs.io/en/stable/handbook/image-file-formats.html
+                                if splitext(name)[1].lower() in supported_extensions:
+                                    folder_counter_images+=1
+                                    folder_size_images+=size
+                                    results.add( (path_nr,subpath,name,mtime,ctime,file_dev,inode,size) )
+                            else:
+                                results.add(path_nr,dir_id,name,mtime,ctime,file_dev,inode,size)
+                                if stream_put:
+                                    stream_files.append( (size,path_join(path,name),file_dev,(path_nr,dir_id,name,mtime,ctime,inode)) )
+
+                    folder_counter+=1
+
+                if stream_files:
+                    stream_put(stream_files)
+
+                with info_lock:
+                    self.info_size_sum+=folder_size
+                    self.info_size_sum_images+=folder_size_images
+
+                    self.info_counter+=folder_counter
+                    self.info_counter_images+=folder_counter_images
+
+            except Exception as e:
+                skipping_action('scandir %s: error:%s',path,e)
+
+        def walker(thread_nr):
+            results = threads_results[thread_nr] = set() if images_mode else FilesTable()
+
+            while True:
+                item = dirs_queue_get()
+                if item is None:
+                    dirs_queue_task_done()
+                    break
+
+                if not self.abort_action:
+                    path_nr,path,dev,dir_id = item
+                    if check_dev and (semaphore:=dev_semaphores.get(dev)):
+                        if not semaphore.acquire(blocking=False):
+                            #device busy - leave the folder for another walker
+                            dirs_queue_put(item)
+                            dirs_queue_task_done()
+                            sleep(0.001)
+                            continue
+                        try:
+                            scan_dir(results,path_nr,path,dev,dir_id)
+                        finally:
+                            semaphore.release()
+                    else:
+                        scan_dir(results,path_nr,path,dev,dir_id)
+
+                dirs_queue_task_done()
+
+        threads_quant = self.scan_threads or min(8,cpu_count())
+        self.log.info('scan threads: %s, per device: %s',threads_quant,self.scan_threads_per_dev)
+
+        walkers = [Thread(target=lambda thread_nr=thread_nr : walker(thread_nr),daemon=True) for thread_nr in range(threads_quant)]
+        for walker_thread in walkers:
+            walker_thread.start()
+
+        dirs_queue.join()
+
+        for walker_thread in walkers:
+            dirs_queue_put(None)
+
+        for walker_thread in walkers:
+            walker_thread.join()
+
+        if stream_put:
+            stream_put(None)
+
+        if any_exclude_list:
+            self.log.info(self.exclude_stats())
+
+        if snapshot_new is not None:
+            self.log.info('snapshot directories reused:%s listed:%s',self.scan_snapshot_reused,sum(map(len,snapshot_new))-self.scan_snapshot_reused)
+            if not self.abort_action:
+                for path_to_scan,snapshot_new_path in zip(paths_to_scan,snapshot_new):
+                    self.scan_snapshot_write(path_to_scan,snapshot_filters,snapshot_new_path)
+
+        return threads_results.values()
+
+    scan_stream=False
+    scan_stream_thread=None
+    def scan_stream_calc(self,stream_queue):
+        #candidates are hashed as soon as the second file of their size is found, results are used by crc_calc like cached ones
+        #spinning disks are left for crc_calc - reading and walking at the same time would cost seeks
+        digest_constructors=get_digest_constructors()
+        digest_algo=self.get_digest_algo(digest_constructors)
+        digest_constructor=digest_constructors[digest_algo]
+        tree_algo=tree_digest_algo(digest_algo)
+
+        self.scan_stream_digests=stream_digests=defaultdict(dict)
+        self.scan_stream_probes=stream_probes=defaultdict(dict)
+
+        buffers_pool=BuffersPool(READ_BUFFER_SIZE,self.io_memory_limit)
+        stores_of_dev={}
+        ssd_of_dev={}
+
+        first_of_size={}
+        files_of_probe=defaultdict(list)
+
+        probe_batch=defaultdict(dict)
+        crc_batch=defaultdict(dict)
+        batch_size=0
+        batch_files=0
+
+        def stores(dev):
+            #preloaded cache - files hashed before are not hashed again
+            if dev not in stores_of_dev:
+                with self.cache_preload_lock:
+                    preload_thread=self.cache_preload_threads.get(dev)
+                if preload_thread:
+                    preload_thread.join()
+                opened=self.cache_preloaded.get(dev)
+                stores_of_dev[dev]=opened[2] if opened else None
+            return stores_of_dev[dev]
+
+        def crc_batch_add(size,fullpath,dev,val):
+            nonlocal batch_size,batch_files
+            crc_batch[dev][(size,fullpath)]=val
+            batch_size+=size
+            batch_files+=1
+
+        def probed(size,fullpath,dev,val,probe):
+            same_probe=files_of_probe[(size,probe)]
+            same_probe.append( (fullpath,dev,val) )
+            if len(same_probe)==2:
+                for same_fullpath,same_dev,same_val in same_probe:
+                    crc_batch_add(size,same_fullpath,same_dev,same_val)
+            elif len(same_probe)>2:
+                crc_batch_add(size,fullpath,dev,val)
+
+        #hardlinked paths are hashed once
+        inodes=set()
+
+        def candidate(size,fullpath,dev,val):
+            nonlocal batch_files
+            if dev not in ssd_of_dev:
+                ssd_of_dev[dev]=bool(self.get_dev_io_strategy(dev)==IO_STRATEGY_SSD)
+            if not ssd_of_dev[dev]:
+                return
+
+            mtime,inode=val[3],val[5]
+            if (dev,inode) in inodes:
+                return
+            inodes.add((dev,inode))
+
+            dev_stores=stores(dev)
+            if dev_stores and (inode,mtime,tree_algo if size>=TREE_MIN_SIZE else digest_algo) in dev_stores[0]:
+                return
+
+            if size<PROBE_MIN_SIZE:
+                crc_batch_add(size,fullpath,dev,val)
+            elif dev_stores and (probe:=dev_stores[1].get((inode,mtime,digest_algo))):
+                probed(size,fullpath,dev,val,probe)
+            else:
+                probe_batch[dev][(size,fullpath)]=val
+                batch_files+=1
+
+        def run(batch,probe):
+            cores={dev:CRCThreadedCalc(self.log,buffers_pool,digest_constructor,probe=probe,readers=self.io_readers or SSD_READERS_DEFAULT,io_hints=self.io_hints,tree_min_size=0 if probe else TREE_MIN_SIZE) for dev in batch}
+            for dev,core in cores.items():
+                core.data_dict=batch[dev]
+                core.start()
+            for core in cores.values():
+                while core.thread_is_alive():
+                    if self.abort_action:
+                        core.abort()
+                    core.thread.join(0.1)
+            batch.clear()
+
+            for dev,core in cores.items():
+                for (size,fullpath),val in core.data_dict.items():
+                    if len(val)==7:
+                        if probe:
+                            stream_probes[dev][(val[5],val[3],digest_algo)]=val[6]
+                            probed(size,fullpath,dev,val[:6],val[6])
+                        else:
+                            stream_digests[dev][(val[5],val[3],tree_algo if size>=TREE_MIN_SIZE else digest_algo)]=val[6]
+
+        def run_batches():
+            nonlocal batch_size,batch_files
+            if probe_batch:
+                run(probe_batch,True)
+            if crc_batch:
+                run(crc_batch,False)
+            batch_size=0
+            batch_files=0
+
+        while not self.abort_action:
+            files=stream_queue.get()
+            if files is None:
+                break
+
+            for size,fullpath,dev,val in files:
+                if size in first_of_size:
+                    if first:=first_of_size[size]:
+                        candidate(size,*first)
+                        first_of_size[size]=None
+                    candidate(size,fullpath,dev,val)
+                else:
+                    first_of_size[size]=(fullpath,dev,val)
+
+            #walk is faster than hashing - readers get bigger batches
+            if batch_size>=STREAM_BATCH_SIZE or batch_files>=STREAM_BATCH_FILES or stream_queue.empty():
+                run_batches()
+
+        if not self.abort_action:
+            run_batches()
+
+        self.log.info('hashed during the walk: %s, probed: %s',sum(map(len,stream_digests.values())),sum(map(len,stream_probes.values())))
+
+        sys_exit() #thread
+
+    def scan_stream_join(self):
+        if self.scan_stream_thread:
+            self.info='Hashing files found by the walk ...'
+            self.scan_stream_thread.join()
+            self.scan_stream_thread=None
+            self.info=''
+
+            return self.scan_stream_digests,self.scan_stream_probes
+
+        return {},{}
+
+    def scan_snapshot_file(self,path_to_scan):
+        from hashlib import sha1
+        return sep.join([self.cache_dir,f'snapshot.{sha1(path_to_scan.encode()).hexdigest()[:16]}.dat'])
+
+    def scan_snapshot_read(self,path_to_scan,filters):
+        try:
+            with open(self.scan_snapshot_file(path_to_scan), "rb") as dat_file:
+                snapshot = loads(ZstdDecompressor().decompress(dat_file.read()))
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.log.warning(f'snapshot of:{path_to_scan} read error: {e}.')
+            return {}
+
+        if (snapshot['format'],snapshot['path'],snapshot['filters'])!=(SCAN_SNAPSHOT_FORMAT,path_to_scan,filters):
+            self.log.info(f'snapshot of:{path_to_scan} not used - different filters')
+            return {}
+
+        self.log.info(f'snapshot of:{path_to_scan} directories:{len(snapshot["dirs"])}')
+        return snapshot['dirs']
+
+    def scan_snapshot_write(self,path_to_scan,filters,dirs):
+        try:
+            Path(self.cache_dir).mkdir(parents=True,exist_ok=True)
+            with open(self.scan_snapshot_file(path_to_scan), "wb") as dat_file:
+                dat_file.write(ZstdCompressor(level=3,threads=-1).compress(dumps({'format':SCAN_SNAPSHOT_FORMAT,'path':path_to_scan,'filters':filters,'dirs':dirs})))
+        except Exception as e:
+            self.log.error(f'snapshot of:{path_to_scan} write error: {e}.')
+
+    def exclude_stats(self):
+        lines=[f'exclude mask:{mask} hits:{fnumber(hits)}' for mask,hits in zip(self.exclude_list,self.exclude_hits)]
+        lines.append(f'exclude matching time:{self.exclude_time:.3f}s pruned directories:{fnumber(self.exclude_pruned)}')
+        return '\n'.join(lines)
+
+    def scan(self,operation_mode,file_min_size_int=0,file_max_size_int=0,include_hidden=False,images_shards=None):
         from PIL.Image import open as image_open
 
         #workaround for:
@@ -362,7 +1877,6 @@ class DudeCore:
 
         self.abort_action=False
 
-        path_nr=0
         self.info_counter=0
         self.info_counter_images=0
         self.info_size_sum=0
@@ -375,321 +1889,498 @@ class DudeCore:
 
         self_scan_results_by_size=self.scan_results_by_size
         self.operation_mode = operation_mode
+        self.scan_filters=(file_min_size_int,file_max_size_int,include_hidden)
+
+        #image cache shards preloaded during the walk, if known
+        self.images_shards = images_shards
+        if images_shards:
+            #shards of legacy cache must exist before preloading reads them
+            self.images_data_cache_migrate()
+        self.cache_preload_start()
+
+        self_scan_results_images = self.scan_results_images = set()
+        self_scan_results_image_to_gps = self.scan_results_image_to_gps = {}
+
+        #############################################################################################
+        if operation_mode in (MODE_SIMILARITY,MODE_GPS):
+            for results in self.scan_walk(True,file_min_size_int,file_max_size_int,include_hidden):
+                self_scan_results_images.update(results)
+
+            #print(f'{self_scan_results_images=}')
+            self.sum_size = self.info_size_sum
+            #self.sum_size_images = sum_size_images
+
+            self.devs=tuple(list({dev for pathnr,path,file_name,mtime,ctime,dev,inode,size in self_scan_results_images}))
+
+            sys_exit() #thread
+
+            #return True
+            #############################################################################################
+        else:
+            from numpy import concatenate,frombuffer,unique,lexsort,zeros,flatnonzero,uint8,uint64,int64
+
+            self_scan_results_by_size.clear()
+
+            tables=list(self.scan_walk(False,file_min_size_int,file_max_size_int,include_hidden))
+
+            if self.abort_action:
+                self.reset()
+                sys_exit() #thread
+                #return False
+
+            ######################################################################
+            #columns of all walkers
+            self.info='Grouping files ...'
+            column = lambda name,dtype : concatenate([frombuffer(getattr(table,name),dtype=dtype) for table in tables]) if tables else zeros(0,dtype=dtype)
+
+            size=column('size',uint64)
+            dev=column('dev',uint64)
+            inode=column('inode',uint64)
+            dir_id=column('dir_id',uint64)
+            pathnr=column('pathnr',uint8)
+            self_dirs_subpath=self.dirs.subpath
+
+            names=[name for table in tables for name in table.name]
+            inode_big={row+rows_offset:inode_val for table,rows_offset in zip(tables,[0]+list(accumulate([len(table.name) for table in tables]))[:-1]) for row,inode_val in table.inode_big.items()}
+
+            self.devs=unique(dev).tolist()
+
+            ######################################################################
+            #inodes collision detection
+            self.info='Inode collision detection'
+            order=lexsort((inode,dev))
+            dev_sorted=dev[order]
+            inode_sorted=inode[order]
+            same=(dev_sorted[1:]==dev_sorted[:-1]) & (inode_sorted[1:]==inode_sorted[:-1])
+
+            collision=zeros(len(size),dtype=bool)
+            collision[order[1:][same]]=True
+
+            self.hardlinks=defaultdict(list)
+            if self.scan_hardlinks:
+                #paths of the same inode - the lowest one represents the hardlink set (order of walkers results varies), others are remembered
+                rows_of_inode=defaultdict(list)
+                for row in set(order[1:][same].tolist()) | set(order[:-1][same].tolist()):
+                    rows_of_inode[(int(dev[row]),inode_big.get(row,int(inode[row])))].append( (self.get_full_path_to_scan(int(pathnr[row]),self_dirs_subpath(int(dir_id[row])),names[row]),row) )
+
+                for key,paths_rows in rows_of_inode.items():
+                    paths_rows.sort()
+                    collision[paths_rows[0][1]]=False
+                    for _,row in paths_rows[1:]:
+                        collision[row]=True
+                        self.hardlinks[key].append( (int(pathnr[row]),self_dirs_subpath(int(dir_id[row])),names[row]) )
+                self.log.info('hardlinks: %s inodes, %s paths',len(self.hardlinks),len(flatnonzero(collision)))
+            else:
+                collision[order[:-1][same]]=True
+
+                for row in flatnonzero(collision).tolist():
+                    self.log.warning('ignoring conflicting inode entry: %s,%s,%s,%s,%s',self_dirs_subpath(int(dir_id[row])),names[row],dev[row],inode_big.get(row,inode[row]),size[row])
+
+            ######################################################################
+            #only sizes of at least two files
+            kept_rows=flatnonzero(~collision)
+            size_inverse,size_counts=unique(size[kept_rows],return_inverse=True,return_counts=True)[1:]
+            multi=size_counts[size_inverse]>1
+            rows=kept_rows[multi]
+
+            self.sum_size = int(size[rows].sum())
+
+            mtime=column('mtime',int64)
+            ctime=column('ctime',int64)
+            def results_add(rows,results):
+                for row,pathnr_row,dir_id_row,mtime_row,ctime_row,dev_row,inode_row,size_row in zip(rows.tolist(),pathnr[rows].tolist(),dir_id[rows].tolist(),mtime[rows].tolist(),ctime[rows].tolist(),dev[rows].tolist(),inode[rows].tolist(),size[rows].tolist()):
+                    results[size_row].add( (pathnr_row,self_dirs_subpath(dir_id_row),names[row],mtime_row,ctime_row,dev_row,inode_big.get(row,inode_row)) )
+
+            results_add(rows,self_scan_results_by_size)
+
+            #every walked file - cache entries of files not found by the walk may be removed (--cache-gc-unseen)
+            self.scan_seen={dev_val:(inode[dev==dev_val],mtime[dev==dev_val],{inode_val:int(mtime[row]) for row,inode_val in inode_big.items() if dev[row]==dev_val}) for dev_val in self.devs}
+
+            #files of unique size are kept for watch mode - duplicates of them may appear later
+            self.scan_results_single=defaultdict(set)
+            if self.scan_watch:
+                results_add(kept_rows[~multi],self.scan_results_single)
+            ######################################################################
+
+            sys_exit() #thread
+            #return True
+
+    def get_dev_cache_id(self,dev):
+        #cache file name: stable filesystem identity if known, st_dev otherwise
+        fs_id=get_dev_fs_id(dev)
+        return fs_id if fs_id else str(dev)
 
-        self_scan_results_images = self.scan_results_images = set()
-        self_scan_results_image_to_gps = self.scan_results_image_to_gps = {}
+    def crc_cache_rename(self,dev,cache_id):
+        #cache of older versions named after st_dev
+        dev_file_name=sep.join([self.cache_dir,f'{dev}.sqlite'])
+        cache_file_name=sep.join([self.cache_dir,f'{cache_id}.sqlite'])
+        if cache_id!=str(dev) and path_exists(dev_file_name) and not path_exists(cache_file_name):
+            try:
+                for suffix in ('-wal','-shm',''):
+                    if path_exists(dev_file_name+suffix):
+                        os_rename(dev_file_name+suffix,cache_file_name+suffix)
+            except Exception as e:
+                self.log.error(f'cache rename of dev: {dev} to: {cache_id} error: {e}.')
+            else:
+                self.log.info(f'cache of dev: {dev} renamed to: {cache_id}')
 
-        use_min_size = bool(file_min_size_int!=0)
-        use_max_size = bool(file_max_size_int!=0)
-        use_size = use_min_size or use_max_size
+    def cache_dir_migrate(self,legacy_cache_dirs_pattern):
+        #cache folders of older versions were named after the version, the latest one is taken over at the first start
+        if path_exists(self.cache_dir):
+            return
 
-        is_hidden_loc=is_hidden
-        #############################################################################################
-        if operation_mode in (MODE_SIMILARITY,MODE_GPS):
+        from glob import glob
+        from shutil import move
+
+        legacy_cache_dirs=[cache_dir for cache_dir in glob(legacy_cache_dirs_pattern) if path_isdir(cache_dir) and normpath(cache_dir)!=normpath(self.cache_dir)]
+        if not legacy_cache_dirs:
+            return
 
-            supported_extensions = IMAGES_EXTENSIONS
+        legacy_cache_dir=max(legacy_cache_dirs,key=lambda cache_dir : stat(cache_dir).st_mtime)
+        self.log.info(f'taking over cache of older version:{legacy_cache_dir}')
 
-            self_log_skipped = self.log_skipped
+        Path(self.cache_dir).mkdir(parents=True,exist_ok=True)
+        for entry in scandir(legacy_cache_dir):
+            if entry.is_file():
+                try:
+                    move(entry.path,sep.join([self.cache_dir,entry.name]))
+                except Exception as e:
+                    self.log.error(f'cache file:{entry.path} move error: {e}.')
+
+    def crc_cache_connect(self,cache_id):
+        #used by the thread that opened it or, after preloading, by the hashing thread
+        connection=sqlite_connect(sep.join([self.cache_dir,f'{cache_id}.sqlite']),timeout=60,check_same_thread=False)
+
+        #auto_vacuum takes effect only for a new database - before anything is written to it
+        connection.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        connection.execute('PRAGMA journal_mode=WAL')
+
+        format_version=connection.execute('PRAGMA user_version').fetchone()[0]
+        if format_version>CACHE_FORMAT_VERSION:
+            connection.close()
+            raise ValueError(f'cache format version: {format_version} is newer than supported: {CACHE_FORMAT_VERSION}')
+
+        if format_version<CACHE_FORMAT_VERSION:
+            with connection:
+                for version in range(format_version,CACHE_FORMAT_VERSION):
+                    CACHE_FORMAT_MIGRATIONS[version](connection)
+                connection.execute(f'PRAGMA user_version={CACHE_FORMAT_VERSION}')
+            self.log.info(f'cache: {cache_id} format version: {format_version} migrated to: {CACHE_FORMAT_VERSION}')
+
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS runs (time INTEGER,lookups INTEGER,hits INTEGER,added INTEGER,removed INTEGER,reclaimed INTEGER)')
+        return connection
+
+    def cache_preload_start(self):
+        #cache of every device found by the walk is opened in the background, hashing starts with a warm cache
+        self.cache_preload_lock=Lock()
+        self.cache_preload_threads={}
+        self.cache_preloaded={}
+        self.cache_preload_warm_stop=Event()
+
+    def cache_preload(self,dev):
+        with self.cache_preload_lock:
+            if dev in self.cache_preload_threads:
+                return
+
+            #results of preloading of aborted scan don't get to the next one
+            preloaded=self.cache_preloaded
+            warm_stop=self.cache_preload_warm_stop
+            self.cache_preload_threads[dev]=thread=Thread(target=lambda : self.cache_preload_dev(dev,preloaded,warm_stop),daemon=True)
+            thread.start()
+
+    def cache_preload_dev(self,dev,preloaded,warm_stop):
+        try:
+            cache_id=self.get_dev_cache_id(dev)
+            if self.operation_mode==MODE_CRC:
+                preloaded[dev]=self.crc_cache_open(dev,cache_id)
+
+                db_file=sep.join([self.cache_dir,f'{cache_id}.sqlite'])
+                if path_exists(db_file) and stat(db_file).st_size<CACHE_PRELOAD_WARM_MAX:
+                    #connection is available already, warm-up goes on its own
+                    Thread(target=lambda : self.cache_preload_warm(dev,db_file,warm_stop),daemon=True).start()
+            elif self.images_shards:
+                preloaded[dev]=(self.images_shards,self.images_data_cache_read_dev(dev,cache_id,self.images_shards))
+        except Exception as e:
+            self.log.error(f'cache preload for dev: {dev} error: {e}.')
 
-            self_exclude_list=self.exclude_list
-            any_exclude_list = bool(self_exclude_list)
-            self_excl_fn=self.excl_fn
+        sys_exit() #thread
 
+    def cache_preload_warm(self,dev,db_file,warm_stop):
+        try:
+            #sequential read puts the database in the page cache, lookups don't wait for the disk later
+            with open(db_file,'rb') as db_file_handle:
+                while not warm_stop.is_set() and not self.abort_action and db_file_handle.read(READ_BUFFER_SIZE):
+                    pass
+        except Exception as e:
+            self.log.error(f'cache warm-up for dev: {dev} error: {e}.')
 
-            self_log_info=self.log.info
-            skipping_action = lambda *args : self_log_info(*args) if self_log_skipped else None
+        sys_exit() #thread
 
-            self_scan_results_images_add = self_scan_results_images.add
+    def cache_preload_take(self):
+        #warm-up is not needed once hashing starts
+        self.cache_preload_warm_stop.set()
+        for thread in self.cache_preload_threads.values():
+            thread.join()
 
-            sum_size = 0
-            #sum_size_images = 0
-            for path_to_scan in self.paths_to_scan:
-                self.info_path_to_scan=path_to_scan
-                self.info_path_nr=path_nr
+        preloaded=self.cache_preloaded
+        self.cache_preload_start()
+        return preloaded
 
-                if self.scan_update_info_path_nr:
-                    self.scan_update_info_path_nr()
+    def crc_cache_open(self,dev,cache_id):
+        self.log.info('reading cache:%s:device:%s:%s',self.cache_dir,dev,cache_id)
+        Path(self.cache_dir).mkdir(parents=True,exist_ok=True)
 
-                loop_list=[]
-                loop_list_append=loop_list.append
-                loop_list_append(path_to_scan)
+        self.crc_cache_rename(dev,cache_id)
+        try:
+            connection=persistent_connection=self.crc_cache_connect(cache_id)
+        except Exception as e:
+            self.log.error(f'cache for dev: {dev} error: {e}.')
+            #not persistent
+            connection=sqlite_connect(':memory:',check_same_thread=False)
+            persistent_connection=None
 
-                loop_list_pop=loop_list.pop
+        stores=(CacheStore(connection,'crc'),CacheStore(connection,'probe'),CacheStore(connection,'segments',pickled=True))
+        self.crc_cache_migrate(dev,stores)
 
-                while loop_list:
-                    path = loop_list_pop()
-                    self.info_line=path
+        return cache_id,persistent_connection,stores
 
-                    ##############################################
-                    try:
-                        with scandir(path) as res:
-                            folder_size=0
-                            folder_size_images=0
-                            folder_counter=0
-                            folder_counter_images=0
-
-                            for entry in res:
-                                if self.abort_action:
-                                    break
-
-                                if entry.is_symlink() :
-                                    skipping_action('skippping link: %s / %s',path,entry.name)
-                                else:
-                                    fullpath=path_join(path,entry.name)
-                                    if not include_hidden and is_hidden_loc(fullpath):
-                                        skipping_action('skipping hidden Mask:%s',fullpath)
-                                        continue
+    def crc_cache_read(self):
+        self.info='Reading cache ...'
+        Path(self.cache_dir).mkdir(parents=True,exist_ok=True)
 
-                                    if any_exclude_list:
-                                        if any({self_excl_fn(expr,fullpath) for expr in self_exclude_list}):
-                                            skipping_action('skipping by Exclude Mask:%s',fullpath)
-                                            continue
-
-                                    if entry.is_dir():
-                                        loop_list_append(fullpath)
-                                    elif entry.is_file():
-                                        try:
-                                            stat_res = stat(entry)
-                                        except Exception as e:
-                                            skipping_action('scandir(stat):%s error:%s',entry.name,e )
-                                        else:
-                                            nlink = stat_res.st_nlink
-                                            if nlink>1:
-                                                skipping_action('scan skipp - hardlinks %s - %s,%s,%s',nlink,path_nr,path,entry.name)
-                                            else:
-                                                #entry.name
-                                                extension = Path(entry).suffix
-                                                #print('extension:',extension,entry.name)
-
-                                                if size:=stat_res.st_size:
-                                                    folder_size+=size
-                                                    #https://pillow.readthedocs.io/en/stable/handbook/image-file-formats.html
-                                                    sum_size+=size
-
-                                                    if use_size:
-                                                        if use_min_size:
-                                                            if size<file_min_size_int:
-                                                                skipping_action(f'size<min {size},{file_min_size_int},{path},{entry.name}' )
-                                                                continue
-                                                        if use_max_size:
-                                                            if size>file_max_size_int:
-                                                                skipping_action(f'size>max {size},{file_max_size_int},{path},{entry.name}' )
-                                                                continue
-
-                                                    if extension.lower() in supported_extensions:
-                                                        #sum_size_images+=size
-                                                        folder_counter_images+=1
-                                                        folder_size_images+=size
-                                                        subpath=path.replace(path_to_scan,'')
-                                                        self_scan_results_images_add( (path_nr,subpath,entry.name,stat_res.st_mtime_ns,stat_res.st_ctime_ns,stat_res.st_dev,stat_res.st_ino,size) )
-
-                                        folder_counter+=1
-                                    else:
-                                        skipping_action('skipping another:%s',path)
-
-                            self.info_size_sum+=folder_size
-                            self.info_size_sum_images+=folder_size_images
-
-                            self.info_counter+=folder_counter
-                            self.info_counter_images+=folder_counter_images
+        files_of_dev=defaultdict(int)
+        self.crc_cache_looked_up=defaultdict(dict)
+        for size,size_set in self.scan_results_by_size.items():
+            for pathnr,path,file_name,mtime,ctime,dev,inode in size_set:
+                files_of_dev[dev]+=1
+                self.crc_cache_looked_up[dev][inode]=mtime
 
-                    except Exception as e:
-                        skipping_action('scandir %s: error:%s',path,e)
+        self.crc_cache_lookups=defaultdict(int)
+        self.crc_cache_hits=defaultdict(int)
 
-                    ##############################################
+        preloaded=self.cache_preload_take()
 
-                    if self.abort_action:
-                        break
+        self.crc_cache={}
+        self.crc_probe_cache={}
+        self.crc_segments_cache={}
+        self.crc_cache_connections={}
+        self.crc_cache_id_of_dev={}
+        for dev in self.devs:
+            opened=preloaded.pop(dev,None)
+            if opened and opened[0] in self.crc_cache_id_of_dev.values():
+                if opened[1]:
+                    opened[1].close()
+                opened=None
+
+            if not opened:
+                cache_id=self.get_dev_cache_id(dev)
+                if cache_id in self.crc_cache_id_of_dev.values():
+                    #the same filesystem identity mounted twice (snapshot, clone)
+                    cache_id=str(dev)
+                opened=self.crc_cache_open(dev,cache_id)
+
+            cache_id,connection,(self.crc_cache[dev],self.crc_probe_cache[dev],self.crc_segments_cache[dev])=opened
+            self.crc_cache_id_of_dev[dev]=cache_id
+            if connection:
+                self.crc_cache_connections[dev]=connection
+
+            for cache in (self.crc_cache,self.crc_probe_cache):
+                if cache[dev].load_if_cheaper(files_of_dev[dev]):
+                    self.log.info(f'cache table {cache[dev].table} of dev: {dev} loaded at once')
+
+        #devices without any file left to hash
+        for cache_id,connection,stores in preloaded.values():
+            if connection:
+                connection.close()
 
-                path_nr+=1
-                if self.abort_action:
-                    break
+        self.info=''
 
-            #print(f'{self_scan_results_images=}')
-            self.sum_size = sum_size
-            #self.sum_size_images = sum_size_images
+    def crc_cache_migrate(self,dev,stores):
+        #whole-file pickles of older versions imported once into the database
+        for store,suffix in zip(stores,('dat','probe.dat','segments.dat')):
+            dat_file_name=sep.join([self.cache_dir,f'{dev}.{suffix}'])
+            if path_exists(dat_file_name):
+                try:
+                    with open(dat_file_name, "rb") as dat_file:
+                        store.update(self.crc_cache_tagged(loads(ZstdDecompressor().decompress(dat_file.read()))))
+                    migrated=len(store.pending)
+                    store.flush()
+                    #imported entries are not new ones in the run statistics
+                    store.added-=migrated
+                    os_remove(dat_file_name)
+                except Exception as e:
+                    self.log.error(f'cache migration of dev: {dev} ({suffix}) error: {e}.')
+                else:
+                    self.log.info(f'cache of dev: {dev} ({suffix}) migrated entries: {migrated}')
 
-            self.devs=tuple(list({dev for pathnr,path,file_name,mtime,ctime,dev,inode,size in self_scan_results_images}))
+    def crc_checkpoint(self,crc_core,algo_of_size,tree_algo):
+        self.log.info('checkpoint')
 
-            sys_exit() #thread
+        for dev,crc_core_dev in crc_core.items():
+            crc_core_dev_data_dict=crc_core_dev.data_dict
 
-            #return True
-            #############################################################################################
-        else:
-            self_scan_results_by_size.clear()
+            done_keys=crc_core_dev.done_keys[crc_core_dev.checkpointed:]
+            crc_core_dev.checkpointed+=len(done_keys)
 
-            self_log_skipped = self.log_skipped
-            self_log_error=self.log.error
+            self_crc_cache_dev=self.crc_cache[dev]
+            for key in done_keys:
+                pathnr,path,file_name,mtime,ctime,inode,crc=crc_core_dev_data_dict[key]
+                self_crc_cache_dev[(inode,mtime,algo_of_size(key[0]))]=crc
 
-            self_exclude_list=self.exclude_list
-            any_exclude_list = bool(self_exclude_list)
-            self_excl_fn=self.excl_fn
+            self_crc_segments_cache_dev=self.crc_segments_cache[dev]
+            with crc_core_dev.done_lock:
+                for key,segments_done in crc_core_dev.segments_done.items():
+                    val=crc_core_dev_data_dict[key]
+                    if segments_done and len(val)==6:
+                        self_crc_segments_cache_dev[(val[5],val[3],tree_algo)]=dict(segments_done)
 
-            self_log_info=self.log.info
-            skipping_action = lambda *args : self_log_info(*args) if self_log_skipped else None
+            try:
+                for cache in (self.crc_cache,self.crc_probe_cache,self.crc_segments_cache):
+                    cache[dev].flush()
+            except Exception as e:
+                self.log.error(f'checkpoint for dev: {dev} error: {e}.')
 
-            for path_to_scan in self.paths_to_scan:
-                self.info_path_to_scan=path_to_scan
-                self.info_path_nr=path_nr
+    def crc_cache_tagged(self,cache):
+        #entries are keyed by (inode,mtime,algorithm), older ones by (inode,mtime) only, digests were kept as hex
+        for key in cache:
+            if len(key)==2:
+                self.log.info('tagging legacy cache entries with:%s',DIGEST_LEGACY)
+                cache={(inode,mtime,DIGEST_LEGACY):digest for (inode,mtime),digest in cache.items()}
+            break
+        return {key:digests_binary(digest) if isinstance(digest,dict) else bytes.fromhex(digest) if isinstance(digest,str) else digest for key,digest in cache.items()}
 
-                if self.scan_update_info_path_nr:
-                    self.scan_update_info_path_nr()
+    def crc_cache_write(self):
+        self.info='Writing cache ...'
 
-                loop_list=[]
-                loop_list_append=loop_list.append
-                loop_list_append(path_to_scan)
+        for dev in self.crc_cache:
+            try:
+                self.log.info(f'writing cache for dev: {dev}')
+                for cache in (self.crc_cache,self.crc_probe_cache,self.crc_segments_cache):
+                    cache[dev].flush()
+                self.crc_cache[dev].connection.close()
+                self.log.info(f'writing cache for dev: {dev} done.')
+            except Exception as e:
+                self.log.error(f'writing cache for dev: {dev} error: {e}.')
 
-                loop_list_pop=loop_list.pop
+        runs_info={self.crc_cache_id_of_dev[dev]:(self.crc_cache_looked_up[dev],self.scan_seen.get(dev),self.crc_cache_lookups[dev],self.crc_cache_hits[dev],self.crc_cache[dev].added) for dev in self.crc_cache_connections}
+        self.crc_cache_gc_thread=Thread(target=lambda : self.crc_cache_gc(runs_info),daemon=True)
+        self.crc_cache_gc_thread.start()
 
-                while loop_list:
-                    path = loop_list_pop()
-                    self.info_line=path
+        del self.crc_cache
+        del self.crc_probe_cache
+        del self.crc_segments_cache
+        del self.crc_cache_connections
+        del self.crc_cache_looked_up
 
-                    ##############################################
-                    try:
-                        with scandir(path) as res:
-                            folder_size=0
-                            folder_counter=0
-
-                            for entry in res:
-                                if self.abort_action:
-                                    break
-
-                                if entry.is_symlink() :
-                                    skipping_action('skippping link: %s / %s',path,entry.name)
-                                else:
-                                    fullpath=path_join(path,entry.name)
-                                    if not include_hidden and is_hidden_loc(fullpath):
-                                        skipping_action('skipping hidden Mask:%s',fullpath)
-                                        continue
+        self.info=''
 
-                                    if any_exclude_list:
-                                        if any({self_excl_fn(expr,fullpath) for expr in self_exclude_list}):
-                                            skipping_action('skipping by Exclude Mask:%s',fullpath)
-                                            continue
-
-                                    if entry.is_dir():
-                                        loop_list_append(fullpath)
-                                    elif entry.is_file():
-                                        try:
-                                            stat_res = stat(entry)
-                                        except Exception as e:
-                                            skipping_action('scandir(stat):%s error:%s',entry.name,e )
-                                        else:
-                                            nlink = stat_res.st_nlink
-                                            if nlink>1:
-                                                skipping_action('scan skipp - hardlinks %s - %s,%s,%s',nlink,path_nr,path,entry.name)
-                                            else:
-                                                if size:=stat_res.st_size:
-                                                    folder_size+=size
-
-                                                    if use_size:
-                                                        if use_min_size:
-                                                            if size<file_min_size_int:
-                                                                skipping_action(f'size<min {size},{file_min_size_int},{path},{entry.name}' )
-                                                                continue
-                                                        if use_max_size:
-                                                            if size>file_max_size_int:
-                                                                skipping_action(f'size>max {size},{file_max_size_int},{path},{entry.name}' )
-                                                                continue
-                                                    subpath=path.replace(path_to_scan,'')
-                                                    self_scan_results_by_size[size].add( (path_nr,subpath,entry.name,stat_res.st_mtime_ns,stat_res.st_ctime_ns,stat_res.st_dev,stat_res.st_ino) )
-
-                                        folder_counter+=1
-                                    else:
-                                        skipping_action('skipping another:%s',path)
-
-                            self.info_size_sum+=folder_size
-                            self.info_counter+=folder_counter
+    def crc_cache_reclaim(self,connection,vacuum=False):
+        page_size=connection.execute('PRAGMA page_size').fetchone()[0]
+        page_count=connection.execute('PRAGMA page_count').fetchone()[0]
+        freelist_count=connection.execute('PRAGMA freelist_count').fetchone()[0]
 
-                    except Exception as e:
-                        skipping_action('scandir %s: error:%s',path,e)
+        if vacuum:
+            connection.execute('VACUUM')
+        elif freelist_count>page_count*CACHE_COMPACT_FREE_RATIO:
+            connection.execute('PRAGMA incremental_vacuum')
 
-                    ##############################################
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
 
-                    if self.abort_action:
-                        break
+        #pages written back from the log may outnumber the freed ones
+        return max(0,(page_count-connection.execute('PRAGMA page_count').fetchone()[0])*page_size)
 
-                path_nr+=1
-                if self.abort_action:
-                    break
+    def crc_cache_gc(self,runs_info):
+        #in background, after writing
+        for cache_id,(looked_up,seen,lookups,hits,added) in runs_info.items():
+            try:
+                connection=self.crc_cache_connect(cache_id)
 
-            if self.abort_action:
-                self.reset()
-                sys_exit() #thread
-                #return False
+                #inode:mtime of every walked file of the device
+                seen_inodes=None
+                if self.cache_gc_unseen and seen is not None:
+                    inodes,mtimes,inodes_big=seen
+                    seen_inodes=dict(zip(inodes.tolist(),mtimes.tolist()))
+                    seen_inodes.update(inodes_big)
 
-            self.devs=list({dev for size,data in self_scan_results_by_size.items() for pathnr,path,file_name,mtime,ctime,dev,inode in data})
+                removed=0
+                for table in CACHE_TABLES:
+                    removed+=cache_gc(connection,table,looked_up,seen_inodes,self.cache_gc_unseen,self.cache_max_age,self.cache_max_entries)
 
-            ######################################################################
-            #inodes collision detection
-            self.info='Inode collision detection'
-            known_dev_inodes=defaultdict(int)
-            for size,data in self_scan_results_by_size.items():
-                for pathnr,path,file_name,mtime,ctime,dev,inode in data:
-                    index=(dev,inode)
-                    known_dev_inodes[index]+=1
-
-            blacklisted_inodes = {index for index in known_dev_inodes if known_dev_inodes[index]>1}
-
-            #self_scan_results_by_size = self.scan_results_by_size
-            for size in list(self_scan_results_by_size):
-                for pathnr,path,file_name,mtime,ctime,dev,inode in list(self_scan_results_by_size[size]):
-                    index=(dev,inode)
-                    if index in blacklisted_inodes:
-                        this_index=(pathnr,path,file_name,mtime,ctime,dev,inode)
-                        self.log.warning('ignoring conflicting inode entry: %s',this_index)
-                        self_scan_results_by_size[size].remove(this_index)
+                reclaimed=self.crc_cache_reclaim(connection)
 
-            ######################################################################
-            sum_size = 0
-            for size in list(self_scan_results_by_size):
-                quant=len(self_scan_results_by_size[size])
-                if quant==1 :
-                    del self_scan_results_by_size[size]
-                else:
-                    sum_size += quant*size
+                with connection:
+                    connection.execute('INSERT INTO runs VALUES (?,?,?,?,?,?)',(int(time()),lookups,hits,added,removed,reclaimed))
+                connection.close()
 
-            self.sum_size = sum_size
-            ######################################################################
+                self.log.info(f'cache gc of: {cache_id} removed: {removed} reclaimed: {bytes_to_str(reclaimed)}')
+            except Exception as e:
+                self.log.error(f'cache gc of: {cache_id} error: {e}.')
 
-            sys_exit() #thread
-            #return True
+        sys_exit() #thread
 
-    def crc_cache_read(self):
-        self.info='Reading cache ...'
-        self.crc_cache={}
-        self_crc_cache=self.crc_cache
-        for dev in self.devs:
-            self_crc_cache_int_dev = self_crc_cache[dev]={}
+    def crc_cache_ids(self):
+        try:
+            return sorted([entry.name[:-7] for entry in scandir(self.cache_dir) if entry.name.endswith('.sqlite')])
+        except Exception as e:
+            self.log.error(e)
+            return []
 
-            self.log.info('reading cache:%s:device:%s',self.cache_dir,dev)
+    def cache_stats(self):
+        lines=[]
+        for cache_id in self.crc_cache_ids():
             try:
-                with open(sep.join([self.cache_dir,f'{dev}.dat']), "rb") as dat_file:
-                    self.crc_cache[dev] = loads(ZstdDecompressor().decompress(dat_file.read()))
-            except Exception as e1:
-                self.log.warning(e1)
-            else:
-                self.log.info(f'cache loaded for dev: {dev}')
-        self.info=''
+                db_file=sep.join([self.cache_dir,f'{cache_id}.sqlite'])
+                connection=self.crc_cache_connect(cache_id)
+                lines.append(f'cache:{cache_id} size:{bytes_to_str(stat(db_file).st_size)} format:{connection.execute("PRAGMA user_version").fetchone()[0]}')
+                for table in CACHE_TABLES:
+                    for algo,count in connection.execute(f'SELECT algo,count(*) FROM {table} GROUP BY algo'):
+                        lines.append(f'  {table:9} {algo:18} {fnumber(count):>14} entries')
+
+                runs=connection.execute('SELECT count(*),sum(lookups),sum(hits),sum(added),sum(removed),sum(reclaimed) FROM runs').fetchone()
+                if runs[0]:
+                    run_time,lookups,hits,added,removed,reclaimed=connection.execute('SELECT time,lookups,hits,added,removed,reclaimed FROM runs ORDER BY rowid DESC LIMIT 1').fetchone()
+                    lines.append(f'  last run:{strftime("%Y/%m/%d %H:%M:%S",localtime_catched(run_time))} hit rate:{100.0*hits/lookups if lookups else 0.0:.1f}% added:{fnumber(added)} removed:{fnumber(removed)} reclaimed:{bytes_to_str(reclaimed)}')
+                    lines.append(f'  all {fnumber(runs[0])} runs: hit rate:{100.0*runs[2]/runs[1] if runs[1] else 0.0:.1f}% added:{fnumber(runs[3])} removed:{fnumber(runs[4])} reclaimed:{bytes_to_str(runs[5])}')
+                connection.close()
+            except Exception as e:
+                lines.append(f'cache:{cache_id} error:{e}')
 
-    def crc_cache_write(self):
-        self.info='Writing cache ...'
+        try:
+            self.images_data_cache_migrate()
+            images_shards=defaultdict(list)
+            for entry in scandir(self.cache_dir):
+                if entry.name.startswith('images.') and entry.name.endswith('.dat'):
+                    cache_id,shard=entry.name[7:-4].rsplit('.',1)
+                    with open(entry.path, "rb") as dat_file:
+                        images_shards[cache_id].append(f'{shard}:{fnumber(len(loads(ZstdDecompressor().decompress(dat_file.read()))["data"]))}')
+            for cache_id,shards_info in sorted(images_shards.items()):
+                lines.append(f'images:{cache_id} ' + ' '.join(sorted(shards_info)))
+        except Exception as e:
+            self.log.info(e)
 
-        Path(self.cache_dir).mkdir(parents=True,exist_ok=True)
+        return '\n'.join(lines) if lines else f'no cache data in:{self.cache_dir}'
 
-        for (dev,val_dict) in self.crc_cache.items():
+    def cache_compact(self):
+        #age and size limits only, scanned files are unknown here
+        lines=[]
+        for cache_id in self.crc_cache_ids():
             try:
-                self.log.info(f'writing cache for dev: {dev}')
-                with open(sep.join([self.cache_dir,f'{dev}.dat']), "wb") as dat_file:
-                    dat_file.write(ZstdCompressor(level=9,threads=-1).compress(dumps(val_dict)))
-                    self.log.info(f'writing cache for dev: {dev} done.')
-            except Exception as e:
-                self.log.error(f'writing cache for dev: {dev} error: {e}.')
+                connection=self.crc_cache_connect(cache_id)
+                removed=0
+                for table in CACHE_TABLES:
+                    removed+=cache_gc(connection,table,None,None,False,self.cache_max_age,self.cache_max_entries)
 
-        del self.crc_cache
+                reclaimed=self.crc_cache_reclaim(connection,vacuum=True)
 
-        self.info=''
+                with connection:
+                    connection.execute('INSERT INTO runs VALUES (?,?,?,?,?,?)',(int(time()),0,0,0,removed,reclaimed))
+                connection.close()
+                lines.append(f'cache:{cache_id} removed:{fnumber(removed)} reclaimed:{bytes_to_str(reclaimed)}')
+            except Exception as e:
+                lines.append(f'cache:{cache_id} error:{e}')
+
+        return '\n'.join(lines) if lines else f'no cache data in:{self.cache_dir}'
 
     info_size_done=0
     info_files_done=0
@@ -699,37 +2390,122 @@ class DudeCore:
     info_speed=0
     info_threads='?'
 
-    def images_data_cache_read(self):
-        self.info='image hashes cache read'
+    def images_cache_shard_file(self,cache_id,shard):
+        return sep.join([self.cache_dir,f'images.{cache_id}.{shard}.dat'])
 
-        self.log.info('reading image hashes cache')
+    def images_cache_shard_write(self,cache_id,shard,data):
+        with open(self.images_cache_shard_file(cache_id,shard), "wb") as dat_file:
+            dat_file.write(ZstdCompressor(level=9,threads=-1).compress(dumps({'format':IMAGES_CACHE_FORMAT[images_cache_shard_kind(shard)],'data':data})))
+
+    def images_data_cache_migrate(self):
+        #single file of older versions split into shards once
+        legacy_file_name=sep.join([self.cache_dir,'imagescache.dat'])
+        if not path_exists(legacy_file_name):
+            return
 
         try:
-            with open(sep.join([self.cache_dir,'imagescache.dat']), "rb") as dat_file:
-                self.images_data_cache = loads(ZstdDecompressor().decompress(dat_file.read()))
-        except Exception as e1:
-            self.log.warning(e1)
-            self.images_data_cache = defaultdict(dict)
+            images_data_cache,outdated_kinds = images_cache_load(legacy_file_name)
+
+            shards_data=defaultdict(dict)
+            for kind,kind_dict in images_data_cache.items():
+                if kind not in outdated_kinds:
+                    for key,val in kind_dict.items():
+                        shards_data[(key[0],images_cache_shard(kind,key))][key[1:]]=val
+
+            cache_id_of_dev={}
+            for (dev,shard),data in shards_data.items():
+                if dev not in cache_id_of_dev:
+                    cache_id_of_dev[dev]=self.get_dev_cache_id(dev)
+                if not path_exists(self.images_cache_shard_file(cache_id_of_dev[dev],shard)):
+                    self.images_cache_shard_write(cache_id_of_dev[dev],shard,data)
+
+            os_remove(legacy_file_name)
+        except Exception as e:
+            self.log.error(f'image hashes cache migration error: {e}.')
         else:
-            self.log.info(f'image hashes cache loaded.')
+            self.log.info('image hashes cache migrated')
+
+    def images_cache_shards(self,operation_mode,hash_size,use_size_pixels):
+        #only shards needed by the run, decode failures always
+        return ['failed'] + (['dimensions'] if use_size_pixels else []) + (['gps'] if operation_mode==MODE_GPS else []) + ([f'hashes{hash_size}'] if operation_mode==MODE_SIMILARITY else [])
+
+    def images_data_cache_read_dev(self,dev,cache_id,shards):
+        #keys in memory are prefixed with dev
+        kinds_data=defaultdict(dict)
+        dirty=set()
+        for shard in shards:
+            kind=images_cache_shard_kind(shard)
+            try:
+                with open(self.images_cache_shard_file(cache_id,shard), "rb") as dat_file:
+                    shard_data = loads(ZstdDecompressor().decompress(dat_file.read()))
+            except FileNotFoundError:
+                pass
+            except Exception as e1:
+                self.log.warning(e1)
+            else:
+                #only data of changed meaning is invalidated
+                if shard_data['format']==IMAGES_CACHE_FORMAT[kind]:
+                    kinds_data[kind].update({(dev,*key):val for key,val in shard_data['data'].items()})
+                else:
+                    self.log.info(f'image hashes cache: {cache_id} {shard} outdated')
+                    dirty.add((dev,shard))
+
+        return kinds_data,dirty
+
+    def images_data_cache_read(self,shards):
+        self.info='image hashes cache read'
+
+        self.log.info(f'reading image hashes cache:{",".join(shards)}')
+
+        Path(self.cache_dir).mkdir(parents=True,exist_ok=True)
+        self.images_data_cache_migrate()
+
+        preloaded=self.cache_preload_take()
+
+        self.images_data_cache = defaultdict(dict)
+        self.images_data_cache_id_of_dev={dev:self.get_dev_cache_id(dev) for dev in self.devs}
+        self.images_data_cache_shards={(dev,shard) for dev in self.devs for shard in shards}
+        self.images_data_cache_dirty=set()
+
+        for dev,cache_id in self.images_data_cache_id_of_dev.items():
+            preloaded_shards,dev_data = preloaded.get(dev,(None,None))
+            kinds_data,dirty = dev_data if preloaded_shards==shards else self.images_data_cache_read_dev(dev,cache_id,shards)
+
+            for kind,kind_dict in kinds_data.items():
+                self.images_data_cache[kind].update(kind_dict)
+            self.images_data_cache_dirty.update(dirty)
+
+        self.log.info(f'image hashes cache loaded.')
 
         self.info=''
 
     def images_data_cache_write(self):
         self.info='Writing ih cache ...'
 
-        Path(self.cache_dir).mkdir(parents=True,exist_ok=True)
-
-        self.log.info(f'writing images hashes cache')
-        try:
-            with open(sep.join([self.cache_dir,'imagescache.dat']), "wb") as dat_file:
-                dat_file.write(ZstdCompressor(level=9,threads=-1).compress(dumps(self.images_data_cache)))
-                self.log.info('writing images hashes cache')
-        except Exception as e:
-            self.log.error(f'writing images hashes cache error: {e}.')
+        #entries of modified files, or (optionally) of all files not found by the scan on scanned devices
+        seen={(dev,inode):mtime for pathnr,path,file_name,mtime,ctime,dev,inode,size in self.scan_results_images}
+        removed=0
+        for kind,kind_dict in self.images_data_cache.items():
+            for key in [key for key in kind_dict if seen.get((key[0],key[1]),key[2] if not self.cache_gc_unseen else None)!=key[2]]:
+                del kind_dict[key]
+                self.images_data_cache_dirty.add((key[0],images_cache_shard(kind,key)))
+                removed+=1
+        self.log.info(f'images hashes cache gc removed: {removed}')
+
+        #only changed shards are written
+        for dev,shard in self.images_data_cache_dirty & self.images_data_cache_shards:
+            kind=images_cache_shard_kind(shard)
+            cache_id=self.images_data_cache_id_of_dev[dev]
+            self.log.info(f'writing images hashes cache:{cache_id} {shard}')
+            try:
+                self.images_cache_shard_write(cache_id,shard,{key[1:]:val for key,val in self.images_data_cache[kind].items() if key[0]==dev and images_cache_shard(kind,key)==shard})
+            except Exception as e:
+                self.log.error(f'writing images hashes cache error: {e}.')
 
         #!!!
         del self.images_data_cache
+        del self.images_data_cache_shards
+        del self.images_data_cache_dirty
 
         self.info=''
 
@@ -757,8 +2533,8 @@ class DudeCore:
             if self.abort_action:
                 break
 
-            #width,height,gps,hashes
-            curr_res = result_dict[index_tuple]=[0,0,None,None]
+            #width,height,gps,hashes,failed
+            curr_res = result_dict[index_tuple]=[0,0,None,None,False]
 
             try:
                 file = image_open(fullpath)
@@ -791,6 +2567,7 @@ class DudeCore:
 
             except Exception as e:
                 self.log.error(f'opening file: {fullpath} error: {e}.')
+                curr_res[4]=True
                 continue
 
             if all_rotations:
@@ -801,6 +2578,7 @@ class DudeCore:
                 except Exception as e:
                     self.log.error(f'hashing file: {fullpath} error: {e}.')
                     print(e)
+                    curr_res[4]=True
                     continue
             else:
                 try:
@@ -809,6 +2587,7 @@ class DudeCore:
                 except Exception as e:
                     self.log.error(f'hashing file: {fullpath} error: {e}.')
                     print(e)
+                    curr_res[4]=True
                     continue
 
         sys_exit() #thread
@@ -826,7 +2605,7 @@ class DudeCore:
         gps_mode = bool(operation_mode==MODE_GPS)
         similarity_mode = bool(operation_mode==MODE_SIMILARITY)
 
-        self.images_data_cache_read()
+        self.images_data_cache_read(self.images_cache_shards(operation_mode,hash_size,use_size_pixels))
         self.scanned_paths=self.paths_to_scan.copy()
 
         self.info_size_done=0
@@ -870,8 +2649,15 @@ class DudeCore:
         self_images_data_cache_dimensions=self_images_data_cache['dimensions']
         self_images_data_cache_gps=self_images_data_cache['gps']
         self_images_data_cache_hashes=self_images_data_cache['hashes']
+        self_images_data_cache_failed=self_images_data_cache['failed']
 
         for pathnr,path,file_name,mtime,ctime,dev,inode,size in sorted(self.scan_results_images, key = lambda x : x[7], reverse=True):
+            #not decoded again
+            if (dev,inode,mtime) in self_images_data_cache_failed:
+                images_quantity_cache_read+=1
+                size_from_cache += size
+                continue
+
             if use_size_pixels:
                 dict_key_dimensions = (dev,inode,mtime)
                 if dict_key_dimensions in self_images_data_cache_dimensions:
@@ -961,17 +2747,26 @@ class DudeCore:
         self.info = self.info_line = 'Data merging ...'
 
         self_images_data_cache = self.images_data_cache
+        self_images_data_cache_dirty_add = self.images_data_cache_dirty.add
 
         for i in range(max_threads):
-            for (pathnr,path,file_name,mtime,ctime,dev,inode,size),(width,height,gps,ihash_rotations) in images_processing_threads_results[i].items():
+            for (pathnr,path,file_name,mtime,ctime,dev,inode,size),(width,height,gps,ihash_rotations,failed) in images_processing_threads_results[i].items():
+                if failed:
+                    self_images_data_cache_failed[(dev,inode,mtime)]=True
+                    self_images_data_cache_dirty_add((dev,'failed'))
+                    anything_new=True
+                    continue
+
                 if ihash_rotations:
                     for rotation,ihash in enumerate(ihash_rotations):
                         if (rotation in rotations_list) and ihash:
                             self_scan_results_images_hashes[(pathnr,path,file_name,ctime,dev,inode,size,rotation)]=ihash
                             self_images_data_cache_hashes[(dev,inode,mtime,hash_size,rotation)]=ihash
+                            self_images_data_cache_dirty_add((dev,f'hashes{hash_size}'))
                             anything_new=True
                 if gps_mode: # and gps brak danych gps tez mozna cacheowac
                     self_images_data_cache_gps[(dev,inode,mtime)]=gps
+                    self_images_data_cache_dirty_add((dev,'gps'))
                     if gps:
                         #..ale nie ustawiać
                         self_scan_results_image_to_gps[(dev,inode)] = gps
@@ -979,6 +2774,7 @@ class DudeCore:
 
                 if width and height:
                     self_images_data_cache_dimensions[(dev,inode,mtime)]=(width,height)
+                    self_images_data_cache_dirty_add((dev,'dimensions'))
                     anything_new=True
 
         if anything_new:
@@ -1061,63 +2857,298 @@ class DudeCore:
                     self_files_of_images_groups[f'G{str(relabel_nr).zfill(groups_digits)}'] = keys
                     relabel_nr+=1
 
-        sys_exit() #thread
+        sys_exit() #thread
+
+    def gps_clustering(self,distance):
+        #from sklearn.cluster import DBSCAN
+        from math import radians
+
+        self.scanned_paths=self.paths_to_scan.copy()
+
+        self.info_line = self.info = 'Preparing data pool ...'
+        #pathnr,path,file_name,ctime,dev,inode,size,
+
+        self_scan_results_image_to_gps = self.scan_results_image_to_gps
+
+        keys=[(path_nr,subpath,name,ctime,dev,ino,size) for (path_nr,subpath,name,mtime,ctime,dev,ino,size) in sorted(self.scan_results_images, key=lambda x :[7],reverse = True) if (dev,ino) in self_scan_results_image_to_gps]
+        pool = [(radians(lo), radians(la)) for (_, _, _, _, dev, ino, _) in keys for lo, la in [self_scan_results_image_to_gps[(dev, ino)]]]
+
+        #used in tooltips
+        #del self.scan_results_image_to_gps
+
+        self_files_of_images_groups = self.files_of_images_groups = {}
+
+        #epsilon_km = 0.5  # Maksymalna odległość między punktami w kilometrach
+        #epsilon = epsilon_km / 6371.0  # Zamiana na radiany (6371 km = promień Ziemi)
+        epsilon = (0.001 + distance) / 6371.0  # Zamiana na radiany (6371 km = promień Ziemi)
+
+        if pool:
+            self.info_line = self.info = 'Clustering ...'
+
+            t0=perf_counter()
+            self.log.info(f'start DBSCAN')
+            labels = DBSCAN(eps=epsilon, min_samples=2,n_jobs=-1,metric='haversine',algorithm='ball_tree').fit(pool).labels_
+            t1=perf_counter()
+            self.log.info(f'DBSCAN end. Time:{t1-t0}')
+
+            groups_dict = defaultdict(set)
+
+            self.info_line = self.info = 'Separating groups ...'
+
+            for label,key in zip(labels,keys):
+                if label!=-1:
+                    groups_dict[label].add(key)
+
+            ##############################################
+
+            groups_digits=len(str(len(groups_dict)))
+
+            relabel_nr=0
+            for label,keys in sorted(groups_dict.items(), key = lambda x : max([y[6] for y in x[1]]),reverse=True ):
+                if len(keys)>1:
+                    self_files_of_images_groups[f'G{str(relabel_nr).zfill(groups_digits)}'] = keys
+                    relabel_nr+=1
+
+        sys_exit() #thread
+
+    io_strategy=IO_STRATEGY_AUTO
+    io_strategy_per_dev={}
+    io_readers=0
+    io_autotune=True
+    io_memory_limit=READ_MEMORY_LIMIT_DEFAULT
+    io_hints=IO_HINTS_READAHEAD
+
+    compare_max=COMPARE_MAX_DEFAULT
+
+    cache_gc_unseen=False
+    cache_max_age=0
+    cache_max_entries=0
+    crc_cache_gc_thread=None
+
+    checkpoint_interval=CHECKPOINT_INTERVAL_DEFAULT
+    checkpoint_size=CHECKPOINT_SIZE_DEFAULT
+
+    def resume_info_write(self):
+        try:
+            Path(self.cache_dir).mkdir(parents=True,exist_ok=True)
+            with open(sep.join([self.cache_dir,'resume.dat']), "wb") as dat_file:
+                dat_file.write(dumps((self.paths_to_scan,self.reg_exp,self.exclude_list)))
+        except Exception as e:
+            self.log.error(e)
+
+    def resume_info_read(self):
+        #paths and exclude masks of the last run that didn't finish hashing
+        try:
+            with open(sep.join([self.cache_dir,'resume.dat']), "rb") as dat_file:
+                return loads(dat_file.read())
+        except Exception as e:
+            self.log.info(e)
+            return None
+
+    def resume_info_remove(self):
+        resume_file=sep.join([self.cache_dir,'resume.dat'])
+        if path_exists(resume_file):
+            try:
+                os_remove(resume_file)
+            except Exception as e:
+                self.log.error(e)
+
+    digest=DIGEST_AUTO
+    def get_digest_algo(self,constructors):
+        if self.digest!=DIGEST_AUTO:
+            return self.digest
+
+        #choice is kept in the cache folder, so the cache doesn't get invalidated by benchmark fluctuations
+        auto_file=sep.join([self.cache_dir,'digest.auto'])
+        try:
+            with open(auto_file,'r') as file_handle:
+                if (algo:=file_handle.read().strip()) in constructors:
+                    return algo
+        except Exception as e:
+            self.log.info(e)
+
+        self.info='Digest algorithms benchmark ...'
+        throughput=digest_benchmark(constructors)
+        for algo,algo_throughput in throughput.items():
+            self.log.info('digest benchmark:%s:%s/s',algo,bytes_to_str(int(algo_throughput)))
+
+        algo=max(throughput,key=throughput.get)
+        try:
+            Path(self.cache_dir).mkdir(parents=True,exist_ok=True)
+            with open(auto_file,'w') as file_handle:
+                file_handle.write(algo)
+        except Exception as e:
+            self.log.error(e)
+
+        return algo
+
+    def set_digest(self,digest):
+        if digest not in DIGESTS:
+            return f'unknown digest algorithm:{digest}'
+        if digest!=DIGEST_AUTO and digest not in get_digest_constructors():
+            return f'digest algorithm not available:{digest}'
+
+        self.digest=digest
+        return False
+    def set_io_strategy_per_dev(self,strategy_per_path):
+        io_strategy_per_dev={}
+        for path,strategy in strategy_per_path.items():
+            if strategy not in IO_STRATEGIES:
+                return f"path:'{path}'\nunknown io strategy:'{strategy}'"
+            try:
+                io_strategy_per_dev[stat(path).st_dev]=strategy
+            except Exception as e:
+                return f"path:'{path}'\nERROR:{e}"
+
+        self.io_strategy_per_dev=io_strategy_per_dev
+        return False
+
+    def get_dev_io_strategy(self,dev):
+        io_strategy=self.io_strategy_per_dev.get(dev,self.io_strategy)
+        if io_strategy==IO_STRATEGY_AUTO:
+            #unknown device type is treated like a spinning disk
+            io_strategy = IO_STRATEGY_SSD if get_dev_rotational(dev) is False else IO_STRATEGY_HDD
+
+        return io_strategy
+
+    def crc_cores_run(self,crc_core,size_done_cached,files_done_cached,sto_by_self_sum_size,sto_by_self_info_total,probe=False,compare_core=None,checkpoint=None):
+        last_time_info_update=0
+        last_time_results_check = 0
+
+        last_checkpoint_time = time()
+        last_checkpoint_size = size_done_cached
+
+        thread_pool_need_checking=True
+        alive_threads=0
+
+        max_threads = cpu_count()
+        self_devs=self.devs
+
+        #device cores and optional comparison core
+        cores=[crc_core[dev] for dev in self_devs]
+        if compare_core:
+            cores.append(compare_core)
+
+        self_files_of_size_of_crc_items = self.files_of_size_of_crc_items
+
+        probe_total = sum([len(crc_core[dev].data_dict) for dev in self_devs]) if probe else 0
+
+        while True:
+            ########################################################################
+            #propagate abort
+            if self.abort_action:
+                for core in cores:
+                    if core.thread_is_alive():
+                        core.abort()
+
+            # threads starting/finishing
+            alive_threads=len([core for core in cores if core.thread_is_alive()])
+
+            no_thread_started=True
+            if thread_pool_need_checking:
+                if alive_threads<max_threads:
+                    for core in cores:
+                        if not core.started and not core.thread_is_alive():
+                            core.start()
+                            no_thread_started=False
+                            break
+
+                all_started=True
+                for core in cores:
+                    if not core.started:
+                        all_started=False
+                        break
+                if all_started:
+                    thread_pool_need_checking=False
 
-    def gps_clustering(self,distance):
-        #from sklearn.cluster import DBSCAN
-        from math import radians
+            ########################################################################
+            # info
+            now=time()
+            if not self.abort_action and now-last_time_info_update>0.15:
+                last_time_info_update=now
 
-        self.scanned_paths=self.paths_to_scan.copy()
+                for core in cores:
+                    if core.autotune and core.thread_is_alive():
+                        core.tune(now)
 
-        self.info_line = self.info = 'Preparing data pool ...'
-        #pathnr,path,file_name,ctime,dev,inode,size,
+                if probe:
+                    self.info='Probing head & tail blocks ... (%s/%s)' % (fnumber(sum([core.files_done for core in cores])),fnumber(probe_total))
+                    continue
 
-        self_scan_results_image_to_gps = self.scan_results_image_to_gps
+                #######################################################
+                #sums info
+                self.info_size_done = size_done_cached + sum([core.size_done + core.progress_info for core in cores])
+                self.info_size_done_perc = sto_by_self_sum_size*self.info_size_done
 
-        keys=[(path_nr,subpath,name,ctime,dev,ino,size) for (path_nr,subpath,name,mtime,ctime,dev,ino,size) in sorted(self.scan_results_images, key=lambda x :[7],reverse = True) if (dev,ino) in self_scan_results_image_to_gps]
-        pool = [(radians(lo), radians(la)) for (_, _, _, _, dev, ino, _) in keys for lo, la in [self_scan_results_image_to_gps[(dev, ino)]]]
+                self.info_files_done = files_done_cached + sum([core.files_done for core in cores])
+                self.info_files_done_perc = sto_by_self_info_total*self.info_files_done
 
-        #used in tooltips
-        #del self.scan_results_image_to_gps
+                if checkpoint:
+                    if (self.checkpoint_interval and now-last_checkpoint_time>self.checkpoint_interval) or (self.checkpoint_size and self.info_size_done-last_checkpoint_size>self.checkpoint_size):
+                        last_checkpoint_time = now
+                        last_checkpoint_size = self.info_size_done
+                        checkpoint()
 
-        self_files_of_images_groups = self.files_of_images_groups = {}
+                if now-last_time_results_check>2:
+                    last_time_results_check=now
 
-        #epsilon_km = 0.5  # Maksymalna odległość między punktami w kilometrach
-        #epsilon = epsilon_km / 6371.0  # Zamiana na radiany (6371 km = promień Ziemi)
-        epsilon = (0.001 + distance) / 6371.0  # Zamiana na radiany (6371 km = promień Ziemi)
+                    #keys are hex digests as in files_of_size_of_crc
+                    crc_to_combo=defaultdict(set)
 
-        if pool:
-            self.info_line = self.info = 'Clustering ...'
+                    for dev in self_devs:
+                        for (size,fullpath),val in crc_core[dev].data_dict.items():
+                            if len(val)==7:
+                                crc_to_combo[val[6].hex()].add( (size,dirname(fullpath)) )
 
-            t0=perf_counter()
-            self.log.info(f'start DBSCAN')
-            labels = DBSCAN(eps=epsilon, min_samples=2,n_jobs=-1,metric='haversine',algorithm='ball_tree').fit(pool).labels_
-            t1=perf_counter()
-            self.log.info(f'DBSCAN end. Time:{t1-t0}')
+                    if compare_core:
+                        for size,members,digest in compare_core.groups:
+                            crc_to_combo[digest.hex()].update([(size,dirname(fullpath)) for fullpath,_ in members])
 
-            groups_dict = defaultdict(set)
+                    for size,size_dict in self_files_of_size_of_crc_items():
+                        for crc,crc_dict in size_dict.items():
+                            for pathnr,path,file_name,_,_,_ in crc_dict:
+                                dirpath =self.paths_to_scan[pathnr]+path
+                                crc_to_combo[crc].add( (size,dirpath) )
 
-            self.info_line = self.info = 'Separating groups ...'
+                    temp_info_groups=0
+                    temp_info_dupe_space=0
+                    temp_info_folders_set=set()
 
-            for label,key in zip(labels,keys):
-                if label!=-1:
-                    groups_dict[label].add(key)
+                    for crc,crc_combo in crc_to_combo.items():
+                        if len(crc_combo)>1:
+                            temp_info_groups+=1
+                            for size,dirpath in crc_combo:
+                                temp_info_dupe_space+=size
+                                temp_info_folders_set.add(dirpath)
 
-            ##############################################
+                    self.info_found_groups=temp_info_groups
+                    self.info_found_dupe_space=temp_info_dupe_space
+                    self.info_found_folders=len(temp_info_folders_set)
+                    temp_info_folders_set.clear()
 
-            groups_digits=len(str(len(groups_dict)))
+            elif alive_threads==0 and no_thread_started:
+                break
+            else:
+                sleep(0.02)
 
-            relabel_nr=0
-            for label,keys in sorted(groups_dict.items(), key = lambda x : max([y[6] for y in x[1]]),reverse=True ):
-                if len(keys)>1:
-                    self_files_of_images_groups[f'G{str(relabel_nr).zfill(groups_digits)}'] = keys
-                    relabel_nr+=1
+        for core in cores:
+            if core.started:
+                core.join()
 
-        sys_exit() #thread
+        if not probe:
+            self.info_size_done = size_done_cached + sum([core.size_done for core in cores])
+            self.info_files_done = files_done_cached + sum([core.files_done for core in cores])
 
     def crc_calc(self):
+        self.resume_info_write()
+        stream_digests,stream_probes=self.scan_stream_join()
         self.crc_cache_read()
 
+        #digests calculated during the walk are used (and saved) like cached ones
+        for dev in self.devs:
+            self.crc_cache[dev].update(stream_digests.get(dev,{}))
+            self.crc_probe_cache[dev].update(stream_probes.get(dev,{}))
+
         self.scanned_paths=self.paths_to_scan.copy()
 
         self.info_size_done=0
@@ -1137,11 +3168,31 @@ class DudeCore:
 
         start = time()
 
+        digest_constructors=get_digest_constructors()
+        digest_algo=self.get_digest_algo(digest_constructors)
+        digest_constructor=digest_constructors[digest_algo]
+        self.log.info('digest algorithm:%s',digest_algo)
+
+        #big files digests are of different kind
+        tree_algo=tree_digest_algo(digest_algo)
+        algo_of_size = lambda size : tree_algo if size>=TREE_MIN_SIZE else digest_algo
+
         crc_core={}
+        probe_core={}
+        io_strategy_of={}
+        buffers_pool=BuffersPool(READ_BUFFER_SIZE,self.io_memory_limit)
         self.log.info('creating crc cores')
         for dev in self.devs:
-            self.log.info('...%s',dev)
-            crc_core[dev]=CRCThreadedCalc(self.log)
+            io_strategy_of[dev] = io_strategy = self.get_dev_io_strategy(dev)
+            readers,order_by_inode = (self.io_readers or SSD_READERS_DEFAULT,False) if io_strategy==IO_STRATEGY_SSD else (1,True)
+
+            #readers number given explicitly is not tuned, rotational disk stays with one reader in inode order
+            if autotune := bool(self.io_autotune and not self.io_readers and io_strategy==IO_STRATEGY_SSD):
+                readers = AUTOTUNE_START_READERS
+
+            self.log.info('...%s io strategy:%s readers:%s autotune:%s io hints:%s',dev,io_strategy,readers,autotune,self.io_hints)
+            crc_core[dev]=CRCThreadedCalc(self.log,buffers_pool,digest_constructor,readers=readers,order_by_inode=order_by_inode,autotune=autotune,io_hints=self.io_hints,tree_min_size=TREE_MIN_SIZE)
+            probe_core[dev]=CRCThreadedCalc(self.log,buffers_pool,digest_constructor,probe=True,readers=readers,order_by_inode=order_by_inode,autotune=autotune,io_hints=self.io_hints)
 
         scan_results_sizes = list(self_scan_results_by_size)
 
@@ -1196,164 +3247,207 @@ class DudeCore:
         self.info="Using cached CRC data ..."
         self.log.info('using cache')
 
+        #sizes with files that need calculation and are big enough to be probed first
+        probe_sizes=[]
+        probe_sizes_append=probe_sizes.append
+
+        self_crc_cache_lookups=self.crc_cache_lookups
+        self_crc_cache_hits=self.crc_cache_hits
+
+        #digests of all files are kept in watch mode - not to hash them again when files of the same size change
+        self_watch_digests=self.watch_digests={} if self.scan_watch else None
+
+        #sizes with any file having (or getting) digest - other files of the same size have to be hashed too
+        hashed_sizes=set()
+        hashed_sizes_add=hashed_sizes.add
+
         for size in best_sizes:
             if self.abort_action:
                 break
 
+            self_files_of_size_of_crc_size=self.files_of_size_of_crc[size]
+            probe_size = bool(size>=PROBE_MIN_SIZE)
+            any_to_calc = False
+            algo = algo_of_size(size)
+
             for pathnr,path,file_name,mtime,ctime,dev,inode in self_scan_results_by_size[size]:
                 if self.abort_action:
                     break
 
-                self_crc_cache_dev=self.crc_cache[dev]
+                self_crc_cache_lookups[dev]+=1
+                if crc:=self.crc_cache[dev].get( (inode,mtime,algo) ):
+                    self_crc_cache_hits[dev]+=1
+                    self.info_size_done+=size
+                    self.info_files_done+=1
+                    hashed_sizes_add(size)
 
-                cache_key=(inode,mtime)
-                self_files_of_size_of_crc_size=self.files_of_size_of_crc[size]
+                    index_tuple=(pathnr,path,file_name,ctime,dev,inode)
+                    self_files_of_size_of_crc_size[crc.hex()].add( index_tuple )
+                    if self_watch_digests is not None:
+                        self_watch_digests[(dev,inode,ctime)]=crc.hex()
 
-                if cache_key in self_crc_cache_dev:
-                    if crc:=self_crc_cache_dev[cache_key]:
-                        self.info_size_done+=size
-                        self.info_files_done+=1
+                    self.info_size_done_perc = sto_by_self_sum_size*self.info_size_done
+                    self.info_files_done_perc = sto_by_self_info_total*self.info_files_done
 
-                        index_tuple=(pathnr,path,file_name,ctime,dev,inode)
-                        self_files_of_size_of_crc_size[crc].add( index_tuple )
+                    continue
 
-                        self.info_size_done_perc = sto_by_self_sum_size*self.info_size_done
-                        self.info_files_done_perc = sto_by_self_info_total*self.info_files_done
+                any_to_calc = True
+                if not probe_size:
+                    fullpath=self.get_full_path_to_scan(pathnr,path,file_name)
 
-                        continue
+                    crc_core[dev].data_dict[(size,fullpath)]=(pathnr,path,file_name,mtime,ctime,inode)
 
-                fullpath=self.get_full_path_to_scan(pathnr,path,file_name)
+            if probe_size and any_to_calc:
+                probe_sizes_append(size)
 
-                crc_core[dev].data_dict[(size,fullpath)]=(pathnr,path,file_name,mtime,ctime,inode)
+        #digests calculated during the walk are not cache hits
+        for dev,digests in stream_digests.items():
+            self_crc_cache_hits[dev]=max(0,self_crc_cache_hits[dev]-len(digests))
 
-        self.info=''
-        self.log.info('using cache done.')
         #########################################################################################################
-        self_scan_results_by_size.clear()
-
-        size_done_cached = self.info_size_done
-        files_done_cached = self.info_files_done
-
-        measures_pool=[]
-
-        last_time_info_update=0
-        last_time_results_check = 0
-        last_time_threads_check = 0
-
-        prev_line_info={}
-        prev_line_show_same_max={}
-
-        for dev in self.devs:
-            prev_line_info[dev]=''
-            prev_line_show_same_max[dev]=0
-
-        thread_pool_need_checking=True
-        alive_threads=0
-
-        max_threads = cpu_count()
-        self_devs=self.devs
-
-        self_files_of_size_of_crc = self.files_of_size_of_crc
-        self_files_of_size_of_crc_items = self.files_of_size_of_crc_items
-
-        while True:
-            ########################################################################
-            #propagate abort
-            if self.abort_action:
-                for dev in self_devs:
-                    if crc_core[dev].thread_is_alive():
-                        crc_core[dev].abort()
-
-            # threads starting/finishing
-            alive_threads=len({dev for dev in self_devs if crc_core[dev].thread_is_alive()})
-
-            no_thread_started=True
-            if thread_pool_need_checking:
-                if alive_threads<max_threads:
-                    for dev in self_devs:
-                        crc_core_dev = crc_core[dev]
-                        if not crc_core_dev.started and not crc_core_dev.thread_is_alive():
-                            crc_core_dev.start()
-                            no_thread_started=False
-                            break
-
-                all_started=True
-                for dev in self_devs:
-                    if not crc_core[dev].started:
-                        all_started=False
-                        break
-                if all_started:
-                    thread_pool_need_checking=False
-
-            ########################################################################
-            # info
-            now=time()
-            if not self.abort_action and now-last_time_info_update>0.15:
-                last_time_info_update=now
-
-                #######################################################
-                #sums info
-                self.info_size_done = size_done_cached + sum([crc_core[dev].size_done + crc_core[dev].progress_info for dev in self_devs])
-                self.info_size_done_perc = sto_by_self_sum_size*self.info_size_done
+        #probe stage - head & tail blocks of every file in the group that may still collide
+        if probe_sizes:
+            self.info="Probing head & tail blocks ..."
+            self.log.info('probing %s sizes',len(probe_sizes))
+
+            probe_of={}
+            for size in probe_sizes:
+                for pathnr,path,file_name,mtime,ctime,dev,inode in self_scan_results_by_size[size]:
+                    cache_key=(inode,mtime,digest_algo)
+                    if probe:=self.crc_probe_cache[dev].get(cache_key):
+                        probe_of[(dev,inode)]=probe
+                    else:
+                        fullpath=self.get_full_path_to_scan(pathnr,path,file_name)
+                        probe_core[dev].data_dict[(size,fullpath)]=(pathnr,path,file_name,mtime,ctime,inode)
+
+            self.crc_cores_run(probe_core,0,0,0.0,0.0,probe=True)
+
+            for dev in self.devs:
+                self_crc_probe_cache_dev=self.crc_probe_cache[dev]
+                for val in probe_core[dev].data_dict.values():
+                    if len(val)==7:
+                        pathnr,path,file_name,mtime,ctime,inode,probe=val
+                        probe_of[(dev,inode)]=probe
+                        self_crc_probe_cache_dev[(inode,mtime,digest_algo)]=probe
+
+            probe_core.clear()
+
+            self.info="Selecting files for full calculation ..."
+            for size in probe_sizes:
+                probe_counter=defaultdict(int)
+                for pathnr,path,file_name,mtime,ctime,dev,inode in self_scan_results_by_size[size]:
+                    if probe:=probe_of.get((dev,inode)):
+                        probe_counter[probe]+=1
+
+                algo = algo_of_size(size)
+                for pathnr,path,file_name,mtime,ctime,dev,inode in self_scan_results_by_size[size]:
+                    if (inode,mtime,algo) in self.crc_cache[dev]:
+                        continue
 
-                self.info_files_done = files_done_cached + sum([crc_core[dev].files_done for dev in self_devs])
-                self.info_files_done_perc = sto_by_self_info_total*self.info_files_done
+                    if probe_counter[probe_of.get((dev,inode))]>1:
+                        fullpath=self.get_full_path_to_scan(pathnr,path,file_name)
+                        crc_core[dev].data_dict[(size,fullpath)]=(pathnr,path,file_name,mtime,ctime,inode)
+                    else:
+                        #unique head & tail (or unreadable) - cannot have duplicates
+                        self.info_size_done+=size
+                        self.info_files_done+=1
 
-                if now-last_time_results_check>2:
-                    last_time_results_check=now
+            self.info_size_done_perc = sto_by_self_sum_size*self.info_size_done
+            self.info_files_done_perc = sto_by_self_info_total*self.info_files_done
 
-                    crc_to_combo=defaultdict(set)
+        #########################################################################################################
+        #few candidates of the same size are compared side by side instead of hashing
+        #spinning disks would have to seek between the files, so only solid-state devices
+        #files big enough for tree hashing are not compared - the digest would not match the cached ones
+        compare_core=None
+        if 1<self.compare_max<=buffers_pool.max_buffers:
+            self.info="Selecting files for comparison ..."
+            compare_core=CompareThreadedCalc(self.log,buffers_pool,digest_constructor,readers=COMPARE_READERS,io_hints=self.io_hints)
+
+            to_calc_of_size=defaultdict(list)
+            for dev in self.devs:
+                if io_strategy_of[dev]==IO_STRATEGY_SSD:
+                    for (size,fullpath),val in crc_core[dev].data_dict.items():
+                        if size not in hashed_sizes:
+                            to_calc_of_size[size].append( (fullpath,dev,val) )
+                else:
+                    for (size,fullpath) in crc_core[dev].data_dict:
+                        hashed_sizes_add(size)
 
-                    for dev in self_devs:
-                        for (size,fullpath),val in crc_core[dev].data_dict.items():
-                            if len(val)==7:
-                                crc_to_combo[val[6]].add( (size,dirname(fullpath)) )
+            for size,to_calc in to_calc_of_size.items():
+                if size not in hashed_sizes and size<TREE_MIN_SIZE and 1<len(to_calc)<=self.compare_max:
+                    for fullpath,dev,_ in to_calc:
+                        del crc_core[dev].data_dict[(size,fullpath)]
 
-                    for size,size_dict in self_files_of_size_of_crc_items():
-                        for crc,crc_dict in size_dict.items():
-                            for pathnr,path,file_name,_,_,_ in crc_dict:
-                                dirpath =self.paths_to_scan[pathnr]+path
-                                crc_to_combo[crc].add( (size,dirpath) )
+                    compare_core.data_dict[(size,tuple([fullpath for fullpath,_,_ in to_calc]))]=[(dev,val) for _,dev,val in to_calc]
 
-                    temp_info_groups=0
-                    temp_info_dupe_space=0
-                    temp_info_folders_set=set()
+            to_calc_of_size.clear()
+            self.log.info('size groups to compare:%s',len(compare_core.data_dict))
 
-                    for crc,crc_combo in crc_to_combo.items():
-                        if len(crc_combo)>1:
-                            temp_info_groups+=1
-                            for size,dirpath in crc_combo:
-                                temp_info_dupe_space+=size
-                                temp_info_folders_set.add(dirpath)
+        #segments of big files hashed by previous, interrupted run
+        for dev in self.devs:
+            self_crc_segments_cache_dev=self.crc_segments_cache[dev]
+            crc_core_dev_segments_done=crc_core[dev].segments_done
+            for (size,fullpath),val in crc_core[dev].data_dict.items():
+                if size>=TREE_MIN_SIZE:
+                    if segments_done:=self_crc_segments_cache_dev.get((val[5],val[3],tree_algo)):
+                        crc_core_dev_segments_done[(size,fullpath)]=dict(segments_done)
 
-                    self.info_found_groups=temp_info_groups
-                    self.info_found_dupe_space=temp_info_dupe_space
-                    self.info_found_folders=len(temp_info_folders_set)
-                    temp_info_folders_set.clear()
+        self.info=''
+        self.log.info('using cache done.')
+        #########################################################################################################
+        #all files are indexed in watch mode
+        if not self.scan_watch:
+            self_scan_results_by_size.clear()
 
-            elif alive_threads==0 and no_thread_started:
-                break
-            else:
-                sleep(0.02)
+        from functools import partial
+        self.crc_cores_run(crc_core,self.info_size_done,self.info_files_done,sto_by_self_sum_size,sto_by_self_info_total,compare_core=compare_core,checkpoint=partial(self.crc_checkpoint,crc_core,algo_of_size,tree_algo))
 
         self.can_abort=False
+        self.log.info('read buffers peak memory: %s (limit: %s)',bytes_to_str(buffers_pool.peak_memory()),bytes_to_str(self.io_memory_limit))
         ########################################################################
         self.info='Merging data ...'
         self.log.info('merging data')
 
-        for dev in self_devs:
-            crc_core_dev = crc_core[dev]
-            if crc_core_dev.started:
-                crc_core_dev.join()
+        self_files_of_size_of_crc = self.files_of_size_of_crc
+
+        for dev in self.devs:
+            #digests saved by checkpoints are in the cache already
+            checkpointed=set(crc_core[dev].done_keys[:crc_core[dev].checkpointed])
 
             #for (size,fullpath),val in sorted(crc_core_dev.data_dict.items(), key = lambda x : int(x[0][0]), reverse=True):
-            for (size,fullpath),val in crc_core_dev.data_dict.items():
+            for (size,fullpath),val in crc_core[dev].data_dict.items():
                 if len(val)==7:
                     pathnr,path,file_name,mtime,ctime,inode,crc=val
-                    self_files_of_size_of_crc[size][crc].add( (pathnr,path,file_name,ctime,dev,inode) )
-
-                    self.crc_cache[dev][(inode,mtime)]=crc
+                    self_files_of_size_of_crc[size][crc.hex()].add( (pathnr,path,file_name,ctime,dev,inode) )
+                    if self_watch_digests is not None:
+                        self_watch_digests[(dev,inode,ctime)]=crc.hex()
+
+                    if (size,fullpath) not in checkpointed:
+                        self.crc_cache[dev][(inode,mtime,algo_of_size(size))]=crc
+
+            #completed files don't need segments any more, others can be resumed
+            self_crc_segments_cache_dev=self.crc_segments_cache[dev]
+            crc_core_dev_data_dict=crc_core[dev].data_dict
+            for key,segments_done in crc_core[dev].segments_done.items():
+                val=crc_core_dev_data_dict[key]
+                cache_key=(val[5],val[3],tree_algo)
+                if len(val)==7 or not segments_done:
+                    self_crc_segments_cache_dev.pop(cache_key,None)
+                else:
+                    self_crc_segments_cache_dev[cache_key]=segments_done
         del crc_core
+
+        if compare_core:
+            #identical files get digest of their data, as if hashed
+            for size,members,digest in compare_core.groups:
+                for _,(dev,(pathnr,path,file_name,mtime,ctime,inode)) in members:
+                    self_files_of_size_of_crc[size][digest.hex()].add( (pathnr,path,file_name,ctime,dev,inode) )
+                    if self_watch_digests is not None:
+                        self_watch_digests[(dev,inode,ctime)]=digest.hex()
+
+                    self.crc_cache[dev][(inode,mtime,digest_algo)]=digest
+            del compare_core
         ########################################################################
 
         self.info='Pruning data ...'
@@ -1365,6 +3459,9 @@ class DudeCore:
 
         self.crc_cache_write()
 
+        if not self.abort_action:
+            self.resume_info_remove()
+
         end=time()
         self.log.info('total time = %s',end-start)
 
@@ -1372,6 +3469,235 @@ class DudeCore:
 
         sys_exit() #thread
 
+    scan_watch=False
+    watch_delay=WATCH_DELAY_DEFAULT
+    watch_thread=None
+    watch_updates=0
+    def watch_start(self):
+        #groups kept up to date after crc_calc - files changed in scanned paths are indexed and hashed again
+        if self.windows:
+            return 'watch mode is available on linux only'
+        if self.operation_mode!=MODE_CRC:
+            return 'watch mode is available in CRC mode only'
+
+        try:
+            self.watch_inotify=Inotify()
+        except Exception as e:
+            self.log.error(f'watch start error: {e}')
+            return f'watch start error: {e}'
+
+        self.watch_exclude_match=ExcludeMatcher(self.exclude_list,self.reg_exp).match if self.exclude_list else None
+
+        digest_constructors=get_digest_constructors()
+        self.watch_digest_constructor=digest_constructors[self.get_digest_algo(digest_constructors)]
+
+        for size,entries in self.scan_results_single.items():
+            self.scan_results_by_size[size].update(entries)
+        self.scan_results_single.clear()
+
+        self.watch_file_of_path={self.get_full_path_to_scan(pathnr,path,file_name):(size,(pathnr,path,file_name,mtime,ctime,dev,inode)) for size,entries in self.scan_results_by_size.items() for pathnr,path,file_name,mtime,ctime,dev,inode in entries}
+
+        self.watch_lock=Lock()
+        self.watch_pending={}
+        self.watch_stopped=False
+
+        watches_error=None
+        for dir_id in range(len(self.dirs.name)):
+            try:
+                self.watch_inotify.add(self.paths_to_scan[self.dirs.pathnr[dir_id]]+self.dirs.subpath(dir_id))
+            except Exception as e:
+                watches_error=e
+        if watches_error:
+            #limit of watches (/proc/sys/fs/inotify/max_user_watches) or directories removed meanwhile
+            self.log.warning(f'not all directories are watched: {watches_error}')
+
+        self.log.info('watching %s directories, %s files',len(self.watch_inotify.path_of_wd),len(self.watch_file_of_path))
+
+        self.watch_thread=Thread(target=self.watch,daemon=True)
+        self.watch_thread.start()
+        return False
+
+    def watch_stop(self):
+        if self.watch_thread:
+            self.watch_stopped=True
+            self.watch_thread.join()
+            self.watch_thread=None
+            self.watch_inotify.close()
+            self.log.info('watch stopped')
+
+    def watch(self):
+        self_watch_inotify=self.watch_inotify
+        self_watch_file_of_path=self.watch_file_of_path
+
+        changed=set()
+        changed_add=changed.add
+        changed_time=0
+
+        while not self.watch_stopped:
+            for dir_path,mask,name in self_watch_inotify.read(WATCH_POLL):
+                if mask & IN_Q_OVERFLOW:
+                    self.log.warning('watch events lost - rescan needed to notice all changes')
+                    continue
+
+                if dir_path is None or (mask & (IN_DELETE_SELF|IN_MOVE_SELF)):
+                    continue
+
+                path=path_join(dir_path,name)
+                if not changed:
+                    changed_time=time()
+
+                if mask & IN_ISDIR:
+                    if mask & (IN_MOVED_FROM|IN_DELETE):
+                        self_watch_inotify.remove_tree(path)
+                        path_sep=path+sep
+                        changed.update([file_path for file_path in self_watch_file_of_path if file_path.startswith(path_sep)])
+                    elif mask & (IN_CREATE|IN_MOVED_TO):
+                        changed.update(self.watch_add_tree(path))
+                else:
+                    changed_add(path)
+
+            if changed and time()-changed_time>=self.watch_delay:
+                try:
+                    self.watch_update(changed)
+                except Exception as e:
+                    self.log.error(f'watch update error: {e}')
+                changed.clear()
+
+        sys_exit() #thread
+
+    def watch_accepted(self,path):
+        #the same filters as scan_walk
+        if not self.scan_filters[2] and is_hidden(path):
+            return False
+        if self.watch_exclude_match and self.watch_exclude_match(path) is not None:
+            return False
+        return True
+
+    def watch_add_tree(self,path):
+        #directory appeared in watched tree - watched and listed, its files returned
+        files=[]
+        dirs=[path]
+        while dirs:
+            dir_path=dirs.pop()
+            if not self.watch_accepted(dir_path):
+                continue
+            try:
+                self.watch_inotify.add(dir_path)
+                with scandir(dir_path) as res:
+                    for entry in res:
+                        if entry.is_symlink():
+                            continue
+                        if entry.is_dir():
+                            dirs.append(entry.path)
+                        else:
+                            files.append(entry.path)
+            except Exception as e:
+                self.log.warning(f'watch of:{dir_path} error: {e}')
+        return files
+
+    def watch_entry(self,path):
+        #(size,scan entry) of file that would be found by the scan, None otherwise
+        dir_path=dirname(path)
+        for pathnr,path_to_scan in enumerate(self.paths_to_scan):
+            if dir_path==path_to_scan or dir_path.startswith(path_to_scan if path_to_scan.endswith(sep) else path_to_scan+sep):
+                break
+        else:
+            return None
+
+        if not self.watch_accepted(path):
+            return None
+
+        try:
+            stat_res=stat(path,follow_symlinks=False)
+        except Exception:
+            return None
+
+        file_min_size_int,file_max_size_int,include_hidden=self.scan_filters
+        size=stat_res.st_size
+        if not S_ISREG(stat_res.st_mode) or (stat_res.st_nlink>1 and not self.scan_hardlinks) or not size or (file_min_size_int and size<file_min_size_int) or (file_max_size_int and size>file_max_size_int):
+            return None
+
+        return size,(pathnr,dir_path[len(path_to_scan):] if dir_path!=path_to_scan else '',basename(path),stat_res.st_mtime_ns,stat_res.st_ctime_ns,stat_res.st_dev,stat_res.st_ino)
+
+    def watch_update(self,paths):
+        self_scan_results_by_size=self.scan_results_by_size
+        self_watch_file_of_path=self.watch_file_of_path
+        self_watch_digests=self.watch_digests
+
+        sizes=set()
+        for path in paths:
+            if old:=self_watch_file_of_path.pop(path,None):
+                size,entry=old
+                self_scan_results_by_size[size].discard(entry)
+                self_watch_digests.pop((entry[5],entry[6],entry[4]),None)
+                if not self_scan_results_by_size[size]:
+                    del self_scan_results_by_size[size]
+                sizes.add(size)
+
+            if new:=self.watch_entry(path):
+                size,entry=new
+                self_watch_file_of_path[path]=new
+                self_scan_results_by_size[size].add(entry)
+                sizes.add(size)
+
+        #only files of sizes with more than one file and without known digest are hashed
+        buffers_pool=BuffersPool(READ_BUFFER_SIZE,self.io_memory_limit)
+        crc_core={}
+        for size in sizes:
+            if len(entries:=self_scan_results_by_size.get(size,()))>1:
+                for pathnr,path,file_name,mtime,ctime,dev,inode in entries:
+                    if (dev,inode,ctime) not in self_watch_digests:
+                        if dev not in crc_core:
+                            crc_core[dev]=CRCThreadedCalc(self.log,buffers_pool,self.watch_digest_constructor,io_hints=self.io_hints,tree_min_size=TREE_MIN_SIZE)
+                        crc_core[dev].data_dict[(size,self.get_full_path_to_scan(pathnr,path,file_name))]=(pathnr,path,file_name,mtime,ctime,inode)
+
+        for crc_core_dev in crc_core.values():
+            crc_core_dev.start()
+
+        for dev,crc_core_dev in crc_core.items():
+            crc_core_dev.join()
+            for val in crc_core_dev.data_dict.values():
+                if len(val)==7:
+                    pathnr,path,file_name,mtime,ctime,inode,crc=val
+                    self_watch_digests[(dev,inode,ctime)]=crc.hex()
+
+        groups_of_size={}
+        for size in sizes:
+            groups=defaultdict(set)
+            #hardlinked paths are one member
+            inodes=set()
+            for pathnr,path,file_name,mtime,ctime,dev,inode in self_scan_results_by_size.get(size,()):
+                if (dev,inode) not in inodes and (crc:=self_watch_digests.get((dev,inode,ctime))):
+                    inodes.add((dev,inode))
+                    groups[crc].add( (pathnr,path,file_name,ctime,dev,inode) )
+            groups_of_size[size]={crc:files for crc,files in groups.items() if len(files)>1}
+
+        with self.watch_lock:
+            self.watch_pending.update(groups_of_size)
+            self.watch_updates+=1
+
+        self.log.info('watch: %s files changed, %s hashed, %s sizes updated',len(paths),sum(len(crc_core_dev.data_dict) for crc_core_dev in crc_core.values()),len(sizes))
+
+    def watch_apply(self):
+        #updated groups are moved to files_of_size_of_crc in the thread of the consumer of results
+        if not self.watch_thread:
+            return 0
+
+        with self.watch_lock:
+            pending=self.watch_pending
+            self.watch_pending={}
+
+        for size,groups in pending.items():
+            if groups:
+                self.files_of_size_of_crc[size]=defaultdict(set,groups)
+            else:
+                self.files_of_size_of_crc.pop(size,None)
+
+        if pending:
+            self.calc_crc_min_len()
+
+        return len(pending)
+
     def check_group_files_state(self,size,crc,operation_mode=MODE_CRC):
         self.log.info('check_group_files_state: %s %s',size,crc)
 
@@ -1431,7 +3757,8 @@ class DudeCore:
                         res_problems_count+=1
                         problem=True
                     else:
-                        if stat_res.st_nlink>1:
+                        #hardlinks kept by the scan - change of links is noticed by ctime
+                        if stat_res.st_nlink>1 and not self.scan_hardlinks:
                             res_problems_dict[res_problems_count]=f'file became hardlink:{stat_res.st_nlink},{pathnr},{path},{file_name}'
                             res_problems_count+=1
                             problem=True
@@ -1450,20 +3777,26 @@ class DudeCore:
 
         return [val for key,val in sorted(res_problems_dict.items(),key=lambda x: x[1]) ],[val for key,val in to_remove_dict.items() ]
 
+    def hardlink_paths(self,dev,inode):
+        #other scanned paths of the file represented in groups
+        return [self.get_full_path_scanned(pathnr,path,file_name) for pathnr,path,file_name in self.hardlinks.get((dev,inode),())]
+
     def write_csv(self,file_name):
         self.log.info('writing csv file: %s',file_name)
 
         with open(file_name,'w') as csv_file:
             csv_file_write = csv_file.write
-            csv_file_write('#size,crc,filepath\n#no checking if the path contains a comma\n')
+            csv_file_write('#size,crc,filepath,hardlink filepath\n#no checking if the path contains a comma\n')
             for size,crc_dict in self.files_of_size_of_crc_items():
                 for crc,index_tuple_list in crc_dict.items():
                     csv_file_write('%s,%s,\n' % (size,crc) )
                     for index_tuple in sorted(index_tuple_list,key= lambda x : x[5]):
                         (pathnr,path,file_name,ctime,dev,inode)=index_tuple
-                        full_path = self.scanned_paths[pathnr]+path
+                        full_path = path_join(self.scanned_paths[pathnr]+path,file_name)
 
                         csv_file_write(',,%s\n' % full_path )
+                        for hardlink_pathnr,hardlink_path,hardlink_file_name in self.hardlinks.get((dev,inode),()):
+                            csv_file_write(',,,%s\n' % path_join(self.scanned_paths[hardlink_pathnr]+hardlink_path,hardlink_file_name) )
             self.log.info('#######################################################')
 
     def check_group_pool_and_prune(self,crc,crc_callback=None):
@@ -1485,12 +3818,19 @@ class DudeCore:
 
     def calc_crc_min_len(self):
         self.info='CRC min length calculation ...'
-        all_crcs_len=len(all_crcs:={crc for size,size_dict in self.files_of_size_of_crc_items() for crc in size_dict})
 
+        #shortest unique prefix - longest common prefix of neighbours in sorted order plus one
         len_temp=4
-        while len({crc[0:len_temp] for crc in all_crcs})!=all_crcs_len:
-            self.info='CRC min length calculation ... (%s)' % len_temp
-            len_temp+=1
+        previous_crc=''
+        for crc in sorted({crc for size,size_dict in self.files_of_size_of_crc_items() for crc in size_dict}):
+            common_len=0
+            for char,previous_char in zip(crc,previous_crc):
+                if char!=previous_char:
+                    break
+                common_len+=1
+
+            len_temp=max(len_temp,common_len+1)
+            previous_crc=crc
 
         self.crc_cut_len=len_temp
         self.info=''
@@ -144,6 +144,8 @@ CFG_KEY_MARK_RE_1 = 'mark_re_1'
 
 CFG_KEY_SHOW_PREVIEW = 'preview_shown'
 
+CFG_KEY_IO_STRATEGY = 'io_strategy'
+
 CFG_LANG = 'lang'
 CFG_RECENTS = 'recents'
 
@@ -183,6 +185,7 @@ cfg_defaults={
     CFG_KEY_MARK_RE_0:False,
     CFG_KEY_MARK_RE_1:False,
     CFG_KEY_SHOW_PREVIEW:True,
+    CFG_KEY_IO_STRATEGY:IO_STRATEGY_AUTO,
     CFG_LANG:'English',
     CFG_RECENTS:''
 }
@@ -604,7 +607,7 @@ class Gui:
 
     lang_dict={'English':'en','Polski':'pl'}
 
-    def __init__(self,cwd,paths_to_add=None,exclude=None,exclude_regexp=None,norun=None,images_mode_tuple=None,size_min_str=0,size_max_str=0):
+    def __init__(self,cwd,paths_to_add=None,exclude=None,exclude_regexp=None,norun=None,images_mode_tuple=None,size_min_str=0,size_max_str=0,io_strategy=None):
         images,ihash,idivergence,rotations,imin,imax,igps = images_mode_tuple if images_mode_tuple else (False,0,0,False,0,0,False)
 
         gc_disable()
@@ -1693,6 +1696,9 @@ class Gui:
 
         self.exclude_regexp_scan.set(self.cfg_get_bool(CFG_KEY_EXCLUDE_REGEXP))
 
+        #command line strategy is used by this session only, not saved
+        self.io_strategy_session = io_strategy
+
         self.main_locked_by_child = None
 
         self_main.deiconify()
@@ -1938,6 +1944,7 @@ class Gui:
             self.file_open_wrapper = StringVar()
             self.folders_open_wrapper = StringVar()
             self.folders_open_wrapper_params = StringVar()
+            self.io_strategy = StringVar()
 
             self.settings = [
                 (self.scan_hidden_var,CFG_KEY_include_hidden),
@@ -1963,7 +1970,8 @@ class Gui:
                 (self.show_mode,CFG_KEY_SHOW_MODE),
                 (self.file_open_wrapper,CFG_KEY_WRAPPER_FILE),
                 (self.folders_open_wrapper,CFG_KEY_WRAPPER_FOLDERS),
-                (self.folders_open_wrapper_params,CFG_KEY_WRAPPER_FOLDERS_PARAMS)
+                (self.folders_open_wrapper_params,CFG_KEY_WRAPPER_FOLDERS_PARAMS),
+                (self.io_strategy,CFG_KEY_IO_STRATEGY)
             ]
 
             row = 0
@@ -2002,7 +2010,11 @@ class Gui:
             label_frame=LabelFrame(self.settings_dialog.area_main, text=STR("Scan options"),borderwidth=2,bg=self.bg_color)
             label_frame.grid(row=row,column=0,sticky='wens',padx=3,pady=3) ; row+=1
 
-            (cb_1:=Checkbutton(label_frame, text = ' ' + STR('Include hidden files / folders in scan'), variable=self.scan_hidden_var)).grid(row=0,column=0,sticky='wens',padx=3,pady=2)
+            (cb_1:=Checkbutton(label_frame, text = ' ' + STR('Include hidden files / folders in scan'), variable=self.scan_hidden_var)).grid(row=0,column=0,columnspan=2,sticky='wens',padx=3,pady=2)
+
+            Label(label_frame,text=STR('Hashing I/O strategy') + ': ',bg=self.bg_color,anchor='w').grid(row=1, column=0,sticky='news',padx=3)
+            (io_strategy_cb:=Combobox(label_frame,values=IO_STRATEGIES,textvariable=self.io_strategy,state='readonly',width=8) ).grid(row=1, column=1,sticky='w',padx=3,pady=2)
+            self_widget_tooltip(io_strategy_cb,STR('TOOLTIP_IO_STRATEGY'))
 
             label_frame=LabelFrame(self.settings_dialog.area_main, text=STR("Main panels and dialogs"),borderwidth=2,bg=self.bg_color)
             label_frame.grid(row=row,column=0,sticky='wens',padx=3,pady=3) ; row+=1
@@ -2594,6 +2606,8 @@ class Gui:
 
                                     except Exception as e :
                                         self.tooltip_lab_configure(text='GPS error:' + str(e))
+                            elif hardlink_paths:=dude_core.hardlink_paths(dev,inode):
+                                self.tooltip_lab_configure(text=coldata + '\n' + STR('Hardlinks') + ':\n' + '\n'.join(hardlink_paths))
                             else:
                                 self.tooltip_lab_configure(text=coldata)
 
@@ -4322,7 +4336,13 @@ class Gui:
 
         #################
 
-        scan_thread=Thread(target=lambda : dude_core.scan(operation_mode,file_min_size_int,file_max_size_int,include_hidden),daemon=True)
+        #images cache shards are preloaded during the walk
+        images_shards = dude_core.images_cache_shards(operation_mode,self.similarity_hsize_varx2.get(),bool(image_min_size_int or image_max_size_int)) if operation_mode in (MODE_SIMILARITY,MODE_GPS) else None
+
+        #strategy is needed by hashing during the walk too
+        dude_core.io_strategy = self.io_strategy_session or self.cfg_get(CFG_KEY_IO_STRATEGY)
+
+        scan_thread=Thread(target=lambda : dude_core.scan(operation_mode,file_min_size_int,file_max_size_int,include_hidden,images_shards),daemon=True)
         scan_thread.start()
 
         self_progress_dialog_on_scan.lab_l1.configure(text=STR('Total space:'))
@@ -4591,6 +4611,7 @@ class Gui:
             self_progress_dialog_on_scan.widget.title(STR('Calculating CRC'))
 
             self_status(STR('Starting CRC threads') + ' ...')
+            dude_core.io_strategy = self.io_strategy_session or self.cfg_get(CFG_KEY_IO_STRATEGY)
             crc_thread=Thread(target=dude_core.crc_calc,daemon=True)
             crc_thread.start()
 
@@ -4710,12 +4731,38 @@ class Gui:
 
         if self.action_abort:
             self.get_info_dialog_on_scan().show(STR('ABORT_INFO'),STR('ABORT_INFO_FULL'))
+        elif dude_core.scan_watch and self.operation_mode==MODE_CRC:
+            if watch_start_res:=dude_core.watch_start():
+                self.status(watch_start_res)
+            else:
+                self.watch_check_schedule()
 
         if self.cfg.get_bool(CFG_KEY_SHOW_PREVIEW):
             self.show_preview(False)
 
         return True
 
+    watch_check_id=None
+    def watch_check_schedule(self):
+        if self.watch_check_id:
+            self.main.after_cancel(self.watch_check_id)
+        self.watch_check_id=self.main.after(1000,self.watch_check)
+
+    def watch_check(self):
+        #groups updated by the watch thread are shown when no file is marked - marks would be lost
+        self.watch_check_id=None
+        if not dude_core.watch_thread:
+            return
+
+        if dude_core.watch_pending:
+            if self.tagged:
+                self.status(STR('Scanned files changed. Unmark all files to refresh groups.'))
+            elif sizes_updated:=dude_core.watch_apply():
+                self.groups_show()
+                self.status(STR('Groups updated') + f': {fnumber(sizes_updated)}')
+
+        self.watch_check_schedule()
+
     def scan_dialog_show(self,do_scan=False):
         self.exclude_mask_update()
         self.paths_to_scan_update()
@@ -4904,6 +4951,11 @@ class Gui:
         if self.cfg_get(CFG_KEY_WRAPPER_FOLDERS_PARAMS)!=self.folders_open_wrapper_params.get():
             self.cfg.set(CFG_KEY_WRAPPER_FOLDERS_PARAMS,self.folders_open_wrapper_params.get())
 
+        if self.cfg_get(CFG_KEY_IO_STRATEGY)!=self.io_strategy.get():
+            self.cfg.set(CFG_KEY_IO_STRATEGY,self.io_strategy.get())
+            #strategy chosen in settings takes over the command line one
+            self.io_strategy_session = None
+
         self.cfg.write()
 
         self.settings_dialog.hide()
@@ -7275,14 +7327,16 @@ if __name__ == "__main__":
         if use_appdir:
             try:
                 from appdirs import user_cache_dir,user_log_dir,user_config_dir
-                CACHE_DIR_DIR = user_cache_dir('dude','PJDude-%s' % VER_TIMESTAMP)
+                CACHE_DIR_DIR = user_cache_dir('dude','PJDude')
+                LEGACY_CACHE_DIR_DIR = user_cache_dir('dude','PJDude-*')
                 LOG_DIR = user_log_dir('dude','PJDude')
                 CONFIG_DIR = user_config_dir('dude')
             except Exception as e_import:
                 print(e_import)
 
         else:
-            CACHE_DIR_DIR = sep.join([PORTABLE_DIR,"cache-%s" % VER_TIMESTAMP])
+            CACHE_DIR_DIR = sep.join([PORTABLE_DIR,"cache"])
+            LEGACY_CACHE_DIR_DIR = sep.join([PORTABLE_DIR,"cache-*"])
             LOG_DIR = sep.join([PORTABLE_DIR,"logs"])
             CONFIG_DIR = PORTABLE_DIR
 
@@ -7355,6 +7409,112 @@ if __name__ == "__main__":
 
         dude_core = DudeCore(CACHE_DIR,logging)
 
+        #cache format is versioned, folders of older versions were named after the version
+        try:
+            dude_core.cache_dir_migrate(sep.join([LEGACY_CACHE_DIR_DIR,node()]))
+        except Exception as e_migrate:
+            l_error(e_migrate)
+
+        scan_threads_per_path={}
+        if p_args.scan_threads_dev:
+            scan_threads_per_path = path_values_to_dict(p_args.scan_threads_dev)
+            if scan_threads_per_path is None:
+                print(f"cannot parse scan-threads-dev values:'{' '.join(p_args.scan_threads_dev)}'")
+                sys.exit(2)
+
+        if set_scan_threads_res:=dude_core.set_scan_threads(p_args.scan_threads[0] if p_args.scan_threads else 0,scan_threads_per_path):
+            print(set_scan_threads_res)
+            sys.exit(2)
+
+        if p_args.io_strategy_dev:
+            io_strategy_per_path = path_values_to_dict(p_args.io_strategy_dev,str)
+            if io_strategy_per_path is None:
+                print(f"cannot parse io-strategy-dev values:'{' '.join(p_args.io_strategy_dev)}'")
+                sys.exit(2)
+
+            if set_io_strategy_res:=dude_core.set_io_strategy_per_dev(io_strategy_per_path):
+                print(set_io_strategy_res)
+                sys.exit(2)
+
+        if p_args.io_readers:
+            dude_core.io_readers = p_args.io_readers[0]
+
+        if p_args.io_no_autotune:
+            dude_core.io_autotune = False
+
+        if p_args.incremental:
+            dude_core.scan_incremental = True
+
+        if p_args.watch:
+            dude_core.scan_watch = True
+
+        if p_args.stream:
+            dude_core.scan_stream = True
+
+        if p_args.one_filesystem:
+            dude_core.scan_one_filesystem = True
+
+        if p_args.skip_fs_types:
+            dude_core.scan_skip_fs_types = p_args.skip_fs_types
+
+        if p_args.hardlinks:
+            dude_core.scan_hardlinks = True
+
+        if p_args.io_hints:
+            dude_core.io_hints = p_args.io_hints[0]
+
+        if p_args.compare_max:
+            dude_core.compare_max = p_args.compare_max[0]
+
+        if p_args.digest:
+            if set_digest_res:=dude_core.set_digest(p_args.digest[0]):
+                print(set_digest_res)
+                sys.exit(2)
+
+        if p_args.io_memory_limit:
+            io_memory_limit = str_to_bytes(p_args.io_memory_limit[0])
+            if io_memory_limit<=0:
+                print(f"cannot parse io-memory-limit value:'{p_args.io_memory_limit[0]}'")
+                sys.exit(2)
+
+            dude_core.io_memory_limit = io_memory_limit
+
+        if p_args.cache_gc_unseen:
+            dude_core.cache_gc_unseen = True
+
+        if p_args.cache_max_age:
+            dude_core.cache_max_age = p_args.cache_max_age[0]*24*60*60
+
+        if p_args.cache_max_entries:
+            dude_core.cache_max_entries = p_args.cache_max_entries[0]
+
+        if p_args.cache_stats or p_args.cache_compact:
+            if p_args.cache_compact:
+                print(dude_core.cache_compact())
+            if p_args.cache_stats:
+                print(dude_core.cache_stats())
+            sys.exit(0)
+
+        if p_args.checkpoint_interval:
+            dude_core.checkpoint_interval = p_args.checkpoint_interval[0]
+
+        if p_args.checkpoint_size:
+            checkpoint_size = str_to_bytes(p_args.checkpoint_size[0])
+            if checkpoint_size<0:
+                print(f"cannot parse checkpoint-size value:'{p_args.checkpoint_size[0]}'")
+                sys.exit(2)
+
+            dude_core.checkpoint_size = checkpoint_size
+
+        if p_args.resume:
+            if resume_info:=dude_core.resume_info_read():
+                p_args.paths,reg_exp,exclude_list = resume_info
+                p_args.exclude,p_args.exclude_regexp = (None,exclude_list) if reg_exp else (exclude_list,None)
+                l_info('resuming scan of:%s',p_args.paths)
+            else:
+                print('no interrupted scan to resume')
+                sys.exit(2)
+
         if p_args.csv:
             signal(SIGINT, lambda a, k : dude_core.handle_sigint())
 
@@ -7371,7 +7531,10 @@ if __name__ == "__main__":
                 print(set_exclude_masks_res)
                 sys.exit(2)
 
-            run_scan_thread=Thread(target=dude_core.scan,daemon=True)
+            if p_args.io_strategy:
+                dude_core.io_strategy = p_args.io_strategy[0]
+
+            run_scan_thread=Thread(target=lambda : dude_core.scan(MODE_CRC),daemon=True)
             run_scan_thread.start()
 
             while run_scan_thread.is_alive():
@@ -7380,6 +7543,10 @@ if __name__ == "__main__":
 
             run_scan_thread.join()
 
+            if dude_core.exclude_list:
+                print('')
+                print(dude_core.exclude_stats())
+
             run_crc_thread=Thread(target=dude_core.crc_calc,daemon=True)
             run_crc_thread.start()
 
@@ -7390,6 +7557,21 @@ if __name__ == "__main__":
             run_crc_thread.join()
             print('')
             dude_core.write_csv(p_args.csv[0])
+
+            if p_args.watch and not dude_core.abort_action:
+                if watch_start_res:=dude_core.watch_start():
+                    print(watch_start_res)
+                else:
+                    print('Watching for changes (Ctrl+C to stop) ...')
+                    while not dude_core.abort_action:
+                        if sizes_updated:=dude_core.watch_apply():
+                            dude_core.write_csv(p_args.csv[0])
+                            print(f'csv updated, sizes: {fnumber(sizes_updated)}')
+                        sleep(0.5)
+                    dude_core.watch_stop()
+
+            if dude_core.crc_cache_gc_thread:
+                dude_core.crc_cache_gc_thread.join()
             print('Done')
 
         else:
@@ -7444,7 +7626,7 @@ if __name__ == "__main__":
                 else:
                     size_max=p_args.sizemax[0]
 
-            Gui( getcwd(),p_args.paths,p_args.exclude,p_args.exclude_regexp,p_args.norun,images_mode_tuple,size_min,size_max )
+            Gui( getcwd(),p_args.paths,p_args.exclude,p_args.exclude_regexp,p_args.norun,images_mode_tuple,size_min,size_max,p_args.io_strategy[0] if p_args.io_strategy else None )
 
     except Exception as e_main:
         print(e_main)
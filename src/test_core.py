@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+
+import logging
+from os import link,stat
+from os.path import join as path_join
+from threading import Thread
+
+import pytest
+
+from pickle import dumps,loads
+from zstandard import ZstdCompressor,ZstdDecompressor
+
+from core import DudeCore,ExcludeMatcher,IMAGES_CACHE_FORMAT,IO_STRATEGY_SSD,MODE_CRC,MODE_SIMILARITY
+
+def test_exclude_matcher_backreference():
+    matcher=ExcludeMatcher(['(a)x','(b)\\1'],True)
+    assert matcher.match('/q/bb')==1
+    assert matcher.match('/q/ax')==0
+    assert matcher.match('/q/ba') is None
+
+def test_exclude_matcher_glob():
+    matcher=ExcludeMatcher(['*.git/*','*x*y*'],False)
+    assert matcher.match('/a/.git/b')==0
+    assert matcher.match('/axzy')==1
+    assert matcher.match('/b') is None
+    assert matcher.prune('/a/.git')==0
+
+#worker threads end with sys_exit
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_write_csv_hardlinks(tmp_path):
+    tree=tmp_path / 'tree'
+    tree.mkdir()
+    (tree / 'a').write_bytes(b'x'*1000)
+    (tree / 'b').write_bytes(b'x'*1000)
+    link(tree / 'a',tree / 'a_link')
+
+    dude_core=DudeCore(str(tmp_path / 'cache'),logging)
+    dude_core.scan_hardlinks=True
+    dude_core.set_paths_to_scan([str(tree)])
+    dude_core.set_exclude_masks(False,[])
+    for target in (lambda : dude_core.scan(MODE_CRC),dude_core.crc_calc):
+        thread=Thread(target=target,daemon=True)
+        thread.start()
+        thread.join()
+    if dude_core.crc_cache_gc_thread:
+        dude_core.crc_cache_gc_thread.join()
+
+    csv_file_name=str(tmp_path / 'groups.csv')
+    dude_core.write_csv(csv_file_name)
+    rows=[line.rstrip('\n').split(',') for line in open(csv_file_name) if not line.startswith('#')]
+
+    crc,=dude_core.files_of_size_of_crc[1000]
+
+    #files in inode order, hardlink represented by the lowest path
+    rows_of_file={'a':[['','',path_join(str(tree),'a')],['','','',path_join(str(tree),'a_link')]],'b':[['','',path_join(str(tree),'b')]]}
+    assert rows==[['1000',crc,'']]+[row for name in sorted(rows_of_file,key=lambda name : stat(tree / name).st_ino) for row in rows_of_file[name]]
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_images_cache_migration_keeps_entries(tmp_path):
+    from PIL.Image import new as image_new
+
+    tree=tmp_path / 'tree'
+    tree.mkdir()
+    image_new('RGB',(64,64),(200,10,10)).save(tree / 'a.png')
+    dev=stat(tree).st_dev
+
+    cache_dir=tmp_path / 'cache'
+    cache_dir.mkdir()
+    legacy_key=(dev,999999,1,8,0)
+    with open(cache_dir / 'imagescache.dat','wb') as dat_file:
+        dat_file.write(ZstdCompressor().compress(dumps({'format':IMAGES_CACHE_FORMAT,'data':{'hashes':{legacy_key:b'legacy'}}})))
+
+    dude_core=DudeCore(str(cache_dir),logging)
+    dude_core.set_paths_to_scan([str(tree)])
+    dude_core.set_exclude_masks(False,[])
+    images_shards=dude_core.images_cache_shards(MODE_SIMILARITY,8,False)
+    for target in (lambda : dude_core.scan(MODE_SIMILARITY,images_shards=images_shards),lambda : dude_core.images_processing(MODE_SIMILARITY,8,False)):
+        thread=Thread(target=target,daemon=True)
+        thread.start()
+        thread.join()
+
+    with open(dude_core.images_cache_shard_file(dude_core.get_dev_cache_id(dev),'hashes8'),'rb') as dat_file:
+        data=loads(ZstdDecompressor().decompress(dat_file.read()))['data']
+
+    assert data[legacy_key[1:]]==b'legacy'
+    assert len(data)==2
+
+def crc_run(cache_dir,tree,compare_max):
+    dude_core=DudeCore(str(cache_dir),logging)
+    dude_core.io_strategy=IO_STRATEGY_SSD
+    dude_core.compare_max=compare_max
+    dude_core.set_paths_to_scan([str(tree)])
+    dude_core.set_exclude_masks(False,[])
+    for target in (lambda : dude_core.scan(MODE_CRC),dude_core.crc_calc):
+        thread=Thread(target=target,daemon=True)
+        thread.start()
+        thread.join()
+    if dude_core.crc_cache_gc_thread:
+        dude_core.crc_cache_gc_thread.join()
+    return dude_core
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_compare_results_cached(tmp_path):
+    tree=tmp_path / 'tree'
+    tree.mkdir()
+    for name,data in (('a',b'x'*5000),('b',b'x'*5000),('c',b'y'*7000),('d',b'y'*6999+b'z')):
+        (tree / name).write_bytes(data)
+
+    compared=crc_run(tmp_path / 'cache',tree,3)
+
+    #same digest as hashing gives
+    hashed=crc_run(tmp_path / 'cache_hashed',tree,0)
+    assert {size:set(crc_dict) for size,crc_dict in compared.files_of_size_of_crc.items()}=={size:set(crc_dict) for size,crc_dict in hashed.files_of_size_of_crc.items()}
+
+    #identical files are not read again
+    rescanned=crc_run(tmp_path / 'cache',tree,3)
+    assert sum(rescanned.crc_cache_hits.values())==2
+    assert {size:set(crc_dict) for size,crc_dict in rescanned.files_of_size_of_crc.items()}=={size:set(crc_dict) for size,crc_dict in hashed.files_of_size_of_crc.items()}
+
+def test_new_cache_incremental_vacuum(tmp_path):
+    dude_core=DudeCore(str(tmp_path),logging)
+    connection=dude_core.crc_cache_connect('test')
+    assert connection.execute('PRAGMA auto_vacuum').fetchone()[0]==2
+    assert dude_core.crc_cache_reclaim(connection,vacuum=True)>=0
+    connection.close()
+
+def test_migrated_cache_entries_not_counted_as_added(tmp_path):
+    with open(tmp_path / '7.dat','wb') as dat_file:
+        dat_file.write(ZstdCompressor().compress(dumps({(100,1):'ab'*20,(101,1):'cd'*20})))
+
+    dude_core=DudeCore(str(tmp_path),logging)
+    cache_id,connection,(crc_store,probe_store,segments_store)=dude_core.crc_cache_open(7,'7')
+    assert crc_store.get((100,1,'sha1'))==bytes.fromhex('ab'*20)
+    assert crc_store.added==0
+    connection.close()
@@ -741,6 +741,14 @@ class LANGUAGES:
             'it': 'Vai al file non contrassegnato precedente',
             'fr': 'Aller au fichier non marqué précédent',
         },
+        'Groups updated': {
+            'pl': 'Zaktualizowane grupy',
+            'es': 'Grupos actualizados',
+            'ru': 'Группы обновлены',
+            'de': 'Gruppen aktualisiert',
+            'it': 'Gruppi aggiornati',
+            'fr': 'Groupes mis à jour',
+        },
         'Groups: ': {
             'pl': 'Grupy: ',
             'es': 'Grupos: ',
@@ -765,6 +773,22 @@ class LANGUAGES:
             'it': 'Crea collegamenti rigidi per i file contrassegnati ...',
             'fr': 'Créer des liens physiques pour les fichiers marqués ...',
         },
+        'Hardlinks': {
+            'pl': 'Twarde dowiązania',
+            'es': 'Enlaces duros',
+            'ru': 'Жёсткие ссылки',
+            'de': 'Harte Links',
+            'it': 'Collegamenti fisici',
+            'fr': 'Liens physiques',
+        },
+        'Hashing I/O strategy': {
+            'pl': 'Strategia odczytu przy hashowaniu',
+            'es': 'Estrategia de E/S para el hashing',
+            'ru': 'Стратегия ввода-вывода при хешировании',
+            'de': 'E/A-Strategie beim Hashen',
+            'it': 'Strategia di I/O per l\'hashing',
+            'fr': 'Stratégie d\'E/S pour le hachage',
+        },
         'Help': {
             'pl': 'Pomoc',
             'es': 'Ayuda',
@@ -1429,6 +1453,14 @@ class LANGUAGES:
             'it': 'Scansiona',
             'fr': 'Analyser',
         },
+        'Scanned files changed. Unmark all files to refresh groups.': {
+            'pl': 'Przeskanowane pliki zmieniły się. Odznacz wszystkie pliki, aby odświeżyć grupy.',
+            'es': 'Los archivos escaneados han cambiado. Desmarque todos los archivos para actualizar los grupos.',
+            'ru': 'Просканированные файлы изменились. Снимите отметку со всех файлов, чтобы обновить группы.',
+            'de': 'Gescannte Dateien wurden geändert. Heben Sie alle Markierungen auf, um die Gruppen zu aktualisieren.',
+            'it': 'I file scansionati sono cambiati. Deseleziona tutti i file per aggiornare i gruppi.',
+            'fr': 'Les fichiers analysés ont changé. Décochez tous les fichiers pour actualiser les groupes.',
+        },
         'Scanning': {
             'pl': 'Skanowanie',
             'es': 'Escaneando',
@@ -1866,6 +1898,15 @@ class LANGUAGES:
             'it': 'Maggiore è il valore della dimensione dell\'hash,\npiù dettagli dell\'immagine vengono presi in considerazione.\nIl valore predefinito è 6',
             'fr': 'Plus la taille du hash est grande,\nplus de détails de l\'image\nsont pris en compte.\nLa valeur par défaut est 6',
         },
+        'TOOLTIP_IO_STRATEGY': {
+            'en': 'auto - detected for every device (spinning disk or solid-state)\nssd - many concurrent readers per device\nhdd - single reader per device, files read in inode order',
+            'pl': 'auto - wykrywana dla każdego urządzenia (dysk obrotowy lub półprzewodnikowy)\nssd - wiele równoległych odczytów na urządzenie\nhdd - pojedynczy odczyt na urządzenie, pliki czytane w kolejności i-węzłów',
+            'es': 'auto - detectada para cada dispositivo (disco giratorio o de estado sólido)\nssd - muchas lecturas simultáneas por dispositivo\nhdd - una sola lectura por dispositivo, archivos leídos en orden de inodos',
+            'ru': 'auto - определяется для каждого устройства (вращающийся или твердотельный диск)\nssd - много параллельных чтений на устройство\nhdd - одно чтение на устройство, файлы читаются в порядке инодов',
+            'de': 'auto - für jedes Gerät erkannt (rotierende Festplatte oder SSD)\nssd - viele gleichzeitige Lesevorgänge pro Gerät\nhdd - ein Lesevorgang pro Gerät, Dateien in Inode-Reihenfolge gelesen',
+            'it': 'auto - rilevata per ogni dispositivo (disco rotante o a stato solido)\nssd - molte letture simultanee per dispositivo\nhdd - una sola lettura per dispositivo, file letti in ordine di inode',
+            'fr': 'auto - détectée pour chaque périphérique (disque rotatif ou SSD)\nssd - nombreuses lectures simultanées par périphérique\nhdd - une seule lecture par périphérique, fichiers lus dans l\'ordre des inodes',
+        },
         'TOOLTIP_MAX_IMAGE': {
             'en': 'Limit the search pool to images with\nboth dimensions (width and height)\nsmaller or equal to the specified value\nin pixels (e.g. 4096)',
             'pl': 'Ogranicz pulę wyszukiwania do obrazów\nktórych wymiary (szerokość i wysokość)\nsą mniejsze od lub równe określonej\nwartości w pikselach (np. 512)',